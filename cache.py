@@ -0,0 +1,155 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() on a miss, so that None can be cached (negative caching)
+MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL (seconds).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+        value = self._load(key)
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(key, value, expires_at)
+        self._store(key, value, expires_at)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def _remember(self, key, value, expires_at: float):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # Hooks for a second-level store; the plain cache is memory only
+    def _load(self, key):
+        return MISSING
+
+    def _store(self, key, value, expires_at: float):
+        pass
+
+    def close(self):
+        pass
+
+class PersistentTTLCache(TTLCache):
+    """
+    TTLCache backed by an SQLite table, so entries survive restarts.
+
+    Memory misses fall through to the table and are promoted on a hit. Values
+    must be JSON serializable. The table is bounded too: on open and every
+    PRUNE_EVERY stores, expired rows are purged and then the rows closest to expiry
+    beyond `maxsize`, so it never holds more than maxsize + PRUNE_EVERY rows.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, path: str, table: str, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self.table = table
+        self._stores = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL) WITHOUT ROWID"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table}(expires_at)")
+            self._prune()
+
+    def _load(self, key):
+        with self._db_lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return MISSING
+        value = json.loads(row[0])
+        self._remember(key, value, row[1])
+        return value
+
+    def _store(self, key, value, expires_at: float):
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._stores += 1
+            if self._stores % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self):
+        # Caller holds _db_lock inside a transaction
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+    def stats(self) -> dict:
+        # "size" is what the table holds; the in-memory tier is a subset of it
+        stats = super().stats()
+        stats["memory_size"] = stats["size"]
+        with self._db_lock:
+            stats["size"] = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return stats
+
+    def items(self, limit: int):
+        """
+        Up to `limit` unexpired (key, value, expires_at) rows, longest-lived first.
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT key, value, expires_at FROM {self.table} WHERE expires_at > ? "
+                "ORDER BY expires_at DESC LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [(key, json.loads(value), expires_at) for key, value, expires_at in rows]
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
@@ -0,0 +1,96 @@
+"""
+Fake Gemini REST server for exercising the LLM timeouts, concurrency limit,
+circuit breaker and streaming without calling Google.
+
+    python fake_gemini.py --port 9921 --delay 2
+    GEMINI_API_KEY=x GEMINI_API_ENDPOINT=http://127.0.0.1:9921 uvicorn main:app
+
+Answers echo the last line of the prompt. `--delay` holds every reply before
+the first byte (past LLM_TIMEOUT it looks like an outage), `--fail` answers
+with HTTP 500, and `--break-after N` stops a streamed answer after N pieces,
+either by closing the connection or, with `--stall`, by going silent.
+GET / returns {"calls": ...}, the number of generate calls received.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _candidate(text: str, finished: bool = False) -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+class FakeGemini(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    calls = 0
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._send_json(200, {"calls": FakeGemini.calls})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with FakeGemini._lock:
+            FakeGemini.calls += 1
+            call = FakeGemini.calls
+        prompt = body["contents"][-1]["parts"][0]["text"]
+        answer = f"fake answer #{call} to: {prompt.splitlines()[-1]}"
+
+        time.sleep(self.options.delay)
+        if self.options.fail:
+            self._send_json(500, {"error": {"code": 500, "message": "fake failure", "status": "INTERNAL"}})
+        elif ":streamGenerateContent" in self.path:
+            self._stream(answer)
+        else:
+            self._send_json(200, _candidate(answer, finished=True))
+
+    def _stream(self, answer: str):
+        # The REST client reads a streamed answer as one JSON array, piece by piece
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.close_connection = True
+        words = answer.split()
+        self.wfile.write(b"[")
+        for i, word in enumerate(words):
+            if i == self.options.break_after:
+                if self.options.stall:
+                    time.sleep(3600)
+                return
+            piece = json.dumps(_candidate(word + " ", finished=i == len(words) - 1))
+            self.wfile.write(((", " if i else "") + piece).encode())
+            self.wfile.flush()
+            time.sleep(self.options.interval)
+        self.wfile.write(b"]")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, data: dict):
+        out = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake Gemini answers for local testing.")
+    parser.add_argument("--port", type=int, default=9921, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each reply (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=0.1,
+                        help="seconds between streamed pieces (default: %(default)s)")
+    parser.add_argument("--fail", action="store_true", help="answer every call with HTTP 500")
+    parser.add_argument("--break-after", type=int, default=None,
+                        help="end streamed answers after this many pieces")
+    parser.add_argument("--stall", action="store_true",
+                        help="with --break-after, go silent instead of closing the connection")
+    FakeGemini.options = parser.parse_args()
+    print(f"Fake Gemini listening on http://127.0.0.1:{FakeGemini.options.port}")
+    ThreadingHTTPServer(("127.0.0.1", FakeGemini.options.port), FakeGemini).serve_forever()
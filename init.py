@@ -1,46 +1,245 @@
 import sqlite3
 import csv
+import argparse
+import hashlib
+import os
+import time
+from itertools import islice
+from schema import migrate, normalize_location
+from raster import build_raster, raster_paths
 
 DB = "groundwater.db"
 CSV = "sample.csv"
+# Heatmap raster served by /api/tiles (see RASTER_DIR in main.py)
+RASTER_DIR = "raster"
 
-schema = """
-CREATE TABLE IF NOT EXISTS groundwater (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    location TEXT UNIQUE,
-    groundwater_level REAL,
-    pH REAL,
-    TDS INTEGER,
-    COD REAL,
-    BOD REAL,
-    status TEXT,
-    last_updated TEXT
-);
-"""
-
-conn = sqlite3.connect(DB)
-cur = conn.cursor()
-cur.executescript(schema)
-
-with open(CSV, "r") as f:
-    dr = csv.DictReader(f)
-    for r in dr:
+# Rows per executemany batch
+BATCH_SIZE = 10000
+
+# PRAGMAs used while bulk loading. synchronous=OFF trades crash safety of the load for
+# speed, which is fine for a reload that can simply be re-run from the CSV.
+BULK_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": -262144,  # 256 MiB
+    "temp_store": "MEMORY",
+}
+
+INSERT_STATION = "INSERT OR IGNORE INTO groundwater (location, location_key) VALUES (?, ?)"
+
+# A new observation date appends to the history; re-ingesting the same one corrects it
+UPSERT_READING = """INSERT INTO readings
+    (location_id, observed_at, groundwater_level, pH, TDS, COD, BOD, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(location_id, observed_at) DO UPDATE SET
+        groundwater_level = excluded.groundwater_level, pH = excluded.pH,
+        TDS = excluded.TDS, COD = excluded.COD, BOD = excluded.BOD,
+        status = excluded.status"""
+
+# Remember the content hash of the newest reading per station (for --incremental)
+UPDATE_STATION_HASH = """UPDATE groundwater SET row_hash = ?, hashed_at = ?
+    WHERE id = ? AND (hashed_at IS NULL OR hashed_at <= ?)"""
+
+# Station coordinates are optional columns; only set when the export provides them
+UPDATE_STATION_COORDS = """UPDATE groundwater SET latitude = ?, longitude = ?
+    WHERE id = ? AND (latitude IS NOT ? OR longitude IS NOT ?)"""
+
+# Parsed rows are (location, location_key, <reading columns...>, latitude, longitude)
+READING = slice(2, 9)
+
+def row_hash(row) -> str:
+    """
+    Stable content hash of a parsed row's date and measurements.
+    """
+    return hashlib.blake2b(repr(row[READING]).encode(), digest_size=8).hexdigest()
+
+def _optional_float(r, i):
+    if i is None or i >= len(r) or not r[i].strip():
+        return None
+    return float(r[i])
+
+def read_batches(f, batch_size: int):
+    """
+    Streams the CSV as lists of parsed rows, `batch_size` rows at a time.
+    """
+    reader = csv.reader(f)
+    header = next(reader)
+    col = {name: i for i, name in enumerate(header)}
+    c_loc, c_date = col["location"], col["last_updated"]
+    c_level, c_ph, c_tds, c_cod, c_bod, c_status = (
+        col["groundwater_level"], col["pH"], col["TDS"], col["COD"], col["BOD"], col["status"]
+    )
+    c_lat, c_lon = col.get("latitude"), col.get("longitude")
+    while True:
+        raw = list(islice(reader, batch_size))
+        if not raw:
+            return
+        batch = []
+        for r in raw:
+            location = r[c_loc]
+            batch.append((
+                location,
+                normalize_location(location),
+                # Rows without a date are stored with observed_at = ''
+                r[c_date] if c_date < len(r) else "",
+                float(r[c_level]),
+                float(r[c_ph]),
+                int(r[c_tds]),
+                float(r[c_cod]),
+                float(r[c_bod]),
+                r[c_status],
+                _optional_float(r, c_lat),
+                _optional_float(r, c_lon),
+            ))
+        yield batch
+
+def resolve_station_ids(cur, station_ids: dict, batch):
+    """
+    Inserts unseen stations and fills `station_ids` (location_key -> id) for them.
+    Stations are only ever added, so their id stays stable for readings.
+    """
+    new = {row[1]: row[0] for row in batch if row[1] not in station_ids}
+    if not new:
+        return
+    cur.executemany(INSERT_STATION, [(location, key) for key, location in new.items()])
+    keys = list(new)
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
         cur.execute(
-            """INSERT OR REPLACE INTO groundwater
-            (location, groundwater_level, pH, TDS, COD, BOD, status, last_updated)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                r["location"],
-                float(r["groundwater_level"]),
-                float(r["pH"]),
-                int(r["TDS"]),
-                float(r["COD"]),
-                float(r["BOD"]),
-                r["status"],
-                r["last_updated"],
-            ),
+            f"SELECT location_key, id FROM groundwater WHERE location_key IN ({placeholders})", chunk
         )
+        station_ids.update(cur.fetchall())
+
+def load_station_state(cur):
+    """
+    location_key -> [id, hashed_at, row_hash] for every known station.
+    """
+    cur.execute("SELECT location_key, id, hashed_at, row_hash FROM groundwater")
+    return {key: [sid, hashed_at, digest] for key, sid, hashed_at, digest in cur}
+
+def source_fingerprint(csv_path: str):
+    st = os.stat(csv_path)
+    return os.path.abspath(csv_path), st.st_size, st.st_mtime_ns
+
+def ingest(conn, csv_path: str, batch_size: int = BATCH_SIZE, bulk: bool = False,
+           incremental: bool = False):
+    """
+    Loads `csv_path` into the database with one executemany per batch.
+
+    By default the whole file is a single transaction. In bulk mode every batch is
+    committed on its own under BULK_PRAGMAS and progress is reported as it goes.
+    In incremental mode unchanged rows are skipped, as is the whole
+    file when its size and mtime match the watermark recorded by the last run.
+    Returns the number of rows written.
+    """
+    cur = conn.cursor()
+    source, size, mtime_ns = source_fingerprint(csv_path)
+    if incremental:
+        mark = cur.execute(
+            "SELECT size, mtime_ns FROM ingest_watermarks WHERE source = ?", (source,)
+        ).fetchone()
+        if mark == (size, mtime_ns):
+            print(f"{csv_path} unchanged since last ingest, nothing to do")
+            return 0
+
+    if bulk:
+        for name, value in BULK_PRAGMAS.items():
+            cur.execute(f"PRAGMA {name}={value}")
+
+    stations = load_station_state(cur)
+    station_ids = {key: state[0] for key, state in stations.items()}
+    read = written = 0
+    max_observed_at = ""
+    started = time.perf_counter()
+    with open(csv_path, "r", newline="") as f:
+        for batch in read_batches(f, batch_size):
+            read += len(batch)
+            readings, newest = [], {}
+            for row in batch:
+                key, observed_at = row[1], row[2]
+                max_observed_at = max(max_observed_at, observed_at)
+                state = stations.get(key)
+                if state is None:
+                    state = stations[key] = [None, None, None]
+                newer = state[1] is None or observed_at >= state[1]
+                # Incremental mode writes a station's first reading, a newer observation,
+                # or a correction to the latest one. Rows older than the latest reading
+                # are assumed ingested already; use a full load to backfill history.
+                if incremental and not newer:
+                    continue
+                if newer:
+                    digest = row_hash(row)
+                    if incremental and observed_at == state[1] and digest == state[2]:
+                        continue
+                    state[1], state[2] = observed_at, digest
+                    newest[key] = state
+                readings.append(row)
+
+            resolve_station_ids(cur, station_ids, readings)
+            cur.executemany(
+                UPSERT_READING,
+                [(station_ids[row[1]],) + row[READING] for row in readings],
+            )
+            coords = {row[1]: row[9:11] for row in batch if row[9] is not None and row[10] is not None}
+            cur.executemany(
+                UPDATE_STATION_COORDS,
+                [(lat, lon, station_ids[key], lat, lon) for key, (lat, lon) in coords.items()
+                 if key in station_ids],
+            )
+            cur.executemany(
+                UPDATE_STATION_HASH,
+                [(state[2], state[1], station_ids[key], state[1]) for key, state in newest.items()],
+            )
+            written += len(readings)
+            if bulk:
+                conn.commit()
+                elapsed = time.perf_counter() - started
+                print(f"  {read} rows read, {written} written ({read / elapsed:,.0f} rows/s)")
+
+    cur.execute(
+        "INSERT OR REPLACE INTO ingest_watermarks VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
+        (source, size, mtime_ns, max_observed_at, read, written),
+    )
+    conn.commit()
+
+    if bulk:
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA optimize")
+    elapsed = time.perf_counter() - started
+    print(f"Read {read} rows, wrote {written} in {elapsed:.2f}s ({read / max(elapsed, 1e-9):,.0f} rows/s)")
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a groundwater CSV export into SQLite.")
+    parser.add_argument("--csv", default=CSV, help="CSV file to load (default: %(default)s)")
+    parser.add_argument("--db", default=DB, help="SQLite database (default: %(default)s)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="bulk mode for large exports: per-batch commits, tuned PRAGMAs, progress")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only write rows that changed since the last ingest")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="rows per batch (default: %(default)s)")
+    parser.add_argument("--journal-mode", default="WAL", choices=["WAL", "OFF", "DELETE", "MEMORY"],
+                        help="journal mode to load with; OFF is fastest but only safe "
+                             "when nothing else has the database open (default: %(default)s)")
+    parser.add_argument("--raster-dir", default=RASTER_DIR,
+                        help="where to write the heatmap raster (default: %(default)s)")
+    parser.add_argument("--raster-resolution", type=float, default=0.01,
+                        help="raster cell size in degrees (default: %(default)s)")
+    parser.add_argument("--no-raster", action="store_true",
+                        help="skip rebuilding the heatmap raster")
+    args = parser.parse_args()
 
-conn.commit()
-conn.close()
-print("Database initialized ->", DB)
\ No newline at end of file
+    conn = sqlite3.connect(args.db)
+    migrate(conn)
+    if args.bulk:
+        conn.execute(f"PRAGMA journal_mode={args.journal_mode}")
+    written = ingest(conn, args.csv, args.batch_size, args.bulk, args.incremental)
+    # The raster only changes with the data, so an ingest that wrote nothing keeps it
+    if not args.no_raster and (written or not os.path.exists(raster_paths(args.raster_dir)[1])):
+        build_raster(conn, args.raster_dir, resolution=args.raster_resolution)
+    if args.bulk and args.journal_mode != "WAL":
+        # The service expects WAL (see DB_PRAGMAS in main.py)
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    print("Database initialized ->", args.db)
@@ -0,0 +1,140 @@
+import csv
+import json
+import math
+import zlib
+import numpy as np
+from intents import tokenize
+
+CORPUS = "intent_corpus.csv"
+MODEL = "intent_model.json"
+
+# Labels the model predicts: the generate_reply query types, plus "general" for
+# questions only the LLM can answer
+LABELS = ("level", "quality", "status", "full", "general")
+
+# Size of the hashed feature space
+BUCKETS = 4096
+
+def features(text: str):
+    """
+    Hashed feature indices of `text`: words, word bigrams and character trigrams
+    (which also catch Tamil/Telugu inflections and typos). crc32 keeps the hash
+    stable across processes, unlike hash().
+    """
+    tokens = tokenize(text)
+    names = [f"w:{t}" for t in tokens]
+    names += [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for t in tokens:
+        padded = f"<{t}>"
+        names += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return sorted({zlib.crc32(name.encode()) % BUCKETS for name in names})
+
+class IntentModel:
+    """
+    Multinomial logistic regression over hashed n-gram features.
+
+    Only the rows of features seen in training are stored, which keeps the JSON
+    small enough to load in a few milliseconds.
+    """
+
+    def __init__(self, labels, weights, bias):
+        self.labels = tuple(labels)
+        self.weights = weights  # (BUCKETS, labels)
+        self.bias = bias
+
+    @classmethod
+    def load(cls, path: str = MODEL):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        weights = np.zeros((data["buckets"], len(data["labels"])))
+        for idx, row in data["weights"].items():
+            weights[int(idx)] = row
+        return cls(data["labels"], weights, np.array(data["bias"]))
+
+    def save(self, path: str = MODEL):
+        used = np.flatnonzero(np.abs(self.weights).sum(axis=1))
+        data = {
+            "labels": list(self.labels),
+            "buckets": len(self.weights),
+            "bias": [round(float(b), 4) for b in self.bias],
+            "weights": {str(i): [round(float(w), 4) for w in self.weights[i]] for i in used},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    def predict(self, text: str):
+        """
+        (label, probability) of the most likely label for `text`.
+        """
+        idx = features(text)
+        scores = self.weights[idx].sum(axis=0) / math.sqrt(max(len(idx), 1)) + self.bias
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+def read_corpus(path: str = CORPUS):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["text"], row["label"]) for row in csv.DictReader(f)]
+
+def train(rows, epochs: int = 600, lr: float = 10.0, l2: float = 1e-4) -> IntentModel:
+    """
+    Fits the model on (text, label) rows with full-batch gradient descent.
+    """
+    x = np.zeros((len(rows), BUCKETS))
+    for r, (text, _) in enumerate(rows):
+        idx = features(text)
+        x[r, idx] = 1 / math.sqrt(max(len(idx), 1))
+    y = np.zeros((len(rows), len(LABELS)))
+    y[np.arange(len(rows)), [LABELS.index(label) for _, label in rows]] = 1
+
+    weights = np.zeros((BUCKETS, len(LABELS)))
+    bias = np.zeros(len(LABELS))
+    for _ in range(epochs):
+        scores = x @ weights + bias
+        probs = np.exp(scores - scores.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        grad = (probs - y) / len(rows)
+        # Features never seen stay exactly zero, so save() can drop them
+        weights -= lr * (x.T @ grad + l2 * weights)
+        bias -= lr * grad.sum(axis=0)
+    return IntentModel(LABELS, weights, bias)
+
+def cross_validate(rows, folds: int = 5, min_confidence: float = 0.5):
+    """
+    Held-out (accuracy, share of data questions answered locally, share of general
+    questions wrongly kept from the LLM), routing at `min_confidence`.
+    """
+    correct = local = data = kept = general = 0
+    for fold in range(folds):
+        held_out = rows[fold::folds]
+        model = train([row for i, row in enumerate(rows) if i % folds != fold])
+        for text, label in held_out:
+            predicted, confidence = model.predict(text)
+            correct += predicted == label
+            routed_locally = predicted != "general" and confidence >= min_confidence
+            if label == "general":
+                general += 1
+                kept += routed_locally
+            else:
+                data += 1
+                local += routed_locally
+    return correct / len(rows), local / max(data, 1), kept / max(general, 1)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Train the local intent model from the labelled corpus.")
+    parser.add_argument("--corpus", default=CORPUS, help="labelled CSV (default: %(default)s)")
+    parser.add_argument("--out", default=MODEL, help="model file to write (default: %(default)s)")
+    args = parser.parse_args()
+
+    rows = read_corpus(args.corpus)
+    accuracy, routed, kept = cross_validate(rows)
+    print(f"{len(rows)} examples, 5-fold accuracy {accuracy:.1%}; data questions answered "
+          f"locally {routed:.1%}, general questions kept from the LLM {kept:.1%}")
+    train(rows).save(args.out)
+    started = time.perf_counter()
+    model = IntentModel.load(args.out)
+    print(f"Saved {args.out}, loads in {(time.perf_counter() - started) * 1e3:.1f} ms")
@@ -0,0 +1,157 @@
+import re
+from typing import NamedTuple, Optional
+
+# Keywords per slot. Matching is on whole words, so "hi" no longer fires inside
+# "this", "which" or "kanchipuram"; multi-word entries match as phrases.
+KEYWORDS = {
+    "greeting": (
+        "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+        "vanakkam", "namaste", "namaskaram", "வணக்கம்", "నమస్కారం", "నమస్తే",
+    ),
+    "define": (
+        "what is", "what s", "what are", "what does", "define", "definition",
+        "meaning of",
+    ),
+    "level": ("level", "levels", "water table", "water tables", "நீர்மட்டம்", "மட்டம்", "మట్టం"),
+    "quality": ("quality", "ph", "tds", "cod", "bod", "தரம்", "నాణ్యత"),
+    "status": (
+        "status", "irrigation", "drinking", "drink", "recommended", "நிலைமை", "స్థితి",
+    ),
+}
+
+# Measurements that have a definition reply, in the order they take precedence
+TERMS = ("tds", "bod", "cod", "ph")
+
+# Words that may accompany a greeting without turning the message into a question
+GREETING_FILLER = {"there", "all", "everyone", "bot", "team", "friend", "sir", "madam", "again"}
+
+# Query types of generate_reply, in the order they take precedence
+QUERY_TYPES = ("level", "quality", "status")
+
+# Word characters plus the Indic blocks, whose vowel signs are not \w on their own
+_TOKEN = re.compile(r"[\wऀ-෿]+")
+
+class Intent(NamedTuple):
+    """
+    name: "greeting", "define" or "data". `term` is the measurement to define (or None),
+    `query_type` the generate_reply type the message asks for if it is about the data;
+    it is set for "define" too, since "what is the ph in salem" names a place.
+    """
+    name: str
+    term: Optional[str] = None
+    query_type: str = "full"
+
+def tokenize(message: str):
+    return _TOKEN.findall(message.casefold())
+
+def _compile(keywords: dict):
+    """
+    {first token: [(phrase tokens, slot), ...]} with longer phrases first.
+    """
+    table = {}
+    for slot, phrases in keywords.items():
+        for phrase in phrases:
+            tokens = tuple(tokenize(phrase))
+            table.setdefault(tokens[0], []).append((tokens, slot))
+    for entries in table.values():
+        entries.sort(key=lambda entry: -len(entry[0]))
+    return table
+
+_PHRASES = _compile(KEYWORDS)
+_GREETING_TOKENS = {
+    token for phrase in KEYWORDS["greeting"] for token in tokenize(phrase)
+} | GREETING_FILLER
+
+def classify(message: str) -> Intent:
+    """
+    Tokenizes `message` once and looks every token up in the compiled keyword table.
+    """
+    tokens = tokenize(message)
+    slots = set()
+    for i, token in enumerate(tokens):
+        for phrase, slot in _PHRASES.get(token, ()):
+            if len(phrase) == 1 or tuple(tokens[i:i + len(phrase)]) == phrase:
+                slots.add(slot)
+                break
+
+    query_type = next((q for q in QUERY_TYPES if q in slots), "full")
+    if "define" in slots and not slots & {"level", "status"}:
+        present = set(tokens)
+        term = next((t for t in TERMS if t in present), None)
+        return Intent("define", term, query_type)
+    if "greeting" in slots and all(t in _GREETING_TOKENS for t in tokens):
+        return Intent("greeting")
+    return Intent("data", query_type=query_type)
+
+# --- Correctness corpus and benchmark: python intents.py ---
+
+CORPUS = [
+    ("hi", Intent("greeting")),
+    ("Hello there!", Intent("greeting")),
+    ("hey bot", Intent("greeting")),
+    ("good morning", Intent("greeting")),
+    ("வணக்கம்", Intent("greeting")),
+    ("నమస్కారం", Intent("greeting")),
+    ("this is the level in chennai", Intent("data", query_type="level")),
+    ("which district has the best water", Intent("data")),
+    ("kanchipuram", Intent("data")),
+    ("report for Thiruvallur", Intent("data")),
+    ("hi, water level in madurai", Intent("data", query_type="level")),
+    ("hello madurai", Intent("data")),
+    ("what is tds", Intent("define", "tds", "quality")),
+    ("What's the meaning of BOD?", Intent("define", "bod", "quality")),
+    ("define cod", Intent("define", "cod", "quality")),
+    ("what does ph mean", Intent("define", "ph", "quality")),
+    ("what is groundwater", Intent("define")),
+    ("hi what is tds", Intent("define", "tds", "quality")),
+    # answer_locally replies with the data instead when a location is named
+    ("what is the ph of water in salem", Intent("define", "ph", "quality")),
+    ("what is the tds in madurai", Intent("define", "tds", "quality")),
+    ("what is the water level in salem", Intent("data", query_type="level")),
+    ("what is the status of vellore", Intent("data", query_type="status")),
+    ("graph of salem", Intent("data")),
+    ("water table of coimbatore", Intent("data", query_type="level")),
+    ("groundwater levels in erode", Intent("data", query_type="level")),
+    ("tds in tiruppur", Intent("data", query_type="quality")),
+    ("pH and quality of water in trichy", Intent("data", query_type="quality")),
+    ("is the water in karur ok for drinking", Intent("data", query_type="status")),
+    ("recommended use in namakkal", Intent("data", query_type="status")),
+    ("codes for dharmapuri", Intent("data")),
+    ("சென்னை நீர்மட்டம்", Intent("data", query_type="level")),
+    ("மதுரை தண்ணீர் தரம்", Intent("data", query_type="quality")),
+    ("తిరుపతి నీటి మట్టం", Intent("data", query_type="level")),
+    ("నెల్లూరు నీటి నాణ్యత", Intent("data", query_type="quality")),
+]
+
+def _substring_baseline(msg: str):
+    """The chained any() checks handle_query used before this module."""
+    msg = msg.lower().strip()
+    if any(k in msg for k in ["hi", "hello", "hey"]):
+        return "greeting"
+    if any(k in msg for k in ["what is", "define", "meaning of", "what does"]):
+        return "define"
+    if any(k in msg for k in ["level", "water table"]):
+        return "level"
+    if any(k in msg for k in ["ph", "tds", "cod", "bod", "quality"]):
+        return "quality"
+    if any(k in msg for k in ["status", "irrigation", "drinking", "recommended"]):
+        return "status"
+    return "full"
+
+if __name__ == "__main__":
+    import timeit
+
+    failures = 0
+    for message, expected in CORPUS:
+        got = classify(message)
+        if got != expected:
+            failures += 1
+            print(f"FAIL {message!r}: expected {expected}, got {got}")
+    print(f"{len(CORPUS) - failures}/{len(CORPUS)} corpus messages classified correctly")
+
+    messages = [message for message, _ in CORPUS]
+    rounds = 2000
+    for label, fn in (("classify", classify), ("substring any()", _substring_baseline)):
+        seconds = timeit.timeit(lambda: [fn(m) for m in messages], number=rounds)
+        print(f"{label:>16}: {seconds / (rounds * len(messages)) * 1e6:.2f} us/message")
+    raise SystemExit(1 if failures else 0)
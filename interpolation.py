@@ -0,0 +1,124 @@
+import numpy as np
+from spatial import EARTH_RADIUS_KM, StationIndex
+
+# Measurements that are interpolated between stations
+FIELDS = ("groundwater_level", "pH", "TDS")
+
+def _unit_vectors(lat_rad, lon_rad):
+    cos_lat = np.cos(lat_rad)
+    return np.stack([cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)], axis=1)
+
+class IDWInterpolator:
+    """
+    Inverse-distance-weighted estimates of FIELDS at arbitrary points.
+
+    The k nearest stations of each point come from the StationIndex; weights and
+    weighted means are then computed for the whole batch at once with NumPy.
+    A point that coincides with a station takes that station's values.
+    """
+
+    def __init__(self, index: StationIndex, records, k: int = 6, power: float = 2.0,
+                 max_km: float = 100.0):
+        self.index = index
+        self.k = max(1, min(k, len(index))) if len(index) else 0
+        self.power = power
+        self.max_km = max_km
+        # (stations, fields); missing measurements are NaN and simply get no weight
+        self.values = np.array(
+            [[np.nan if rec[f] is None else rec[f] for f in FIELDS] for rec in records],
+            dtype=float,
+        ).reshape(len(records), len(FIELDS))
+
+    # Up to this many stations, neighbours are found by brute force with NumPy, which
+    # beats per-point KD-tree queries for large batches such as raster grids
+    BRUTE_FORCE_STATIONS = 4096
+    BRUTE_FORCE_CHUNK = 8192
+
+    def neighbours(self, points):
+        """
+        (distances_km, station_indices) arrays of shape (points, k), closest first.
+        """
+        if len(self.index) <= self.BRUTE_FORCE_STATIONS and len(points) > 1:
+            return self._neighbours_brute_force(np.asarray(points, dtype=float))
+        m = len(points)
+        distances = np.full((m, self.k), np.inf)
+        indices = np.zeros((m, self.k), dtype=np.intp)
+        for row, (lat, lon) in enumerate(points):
+            for col, (distance, idx) in enumerate(self.index.nearest(lat, lon, self.k)):
+                distances[row, col] = distance
+                indices[row, col] = idx
+        return distances, indices
+
+    def _neighbours_brute_force(self, points):
+        stations = np.radians(np.asarray(self.index.points, dtype=float))
+        s_xyz = _unit_vectors(stations[:, 0], stations[:, 1])            # (n, 3)
+        distances = np.empty((len(points), self.k))
+        indices = np.empty((len(points), self.k), dtype=np.intp)
+        for start in range(0, len(points), self.BRUTE_FORCE_CHUNK):
+            chunk = np.radians(points[start:start + self.BRUTE_FORCE_CHUNK])
+            p_xyz = _unit_vectors(chunk[:, 0], chunk[:, 1])              # (c, 3)
+            cos = np.clip(p_xyz @ s_xyz.T, -1.0, 1.0)                    # (c, n)
+            nearest = np.argpartition(-cos, self.k - 1, axis=1)[:, :self.k]
+            order = np.argsort(-np.take_along_axis(cos, nearest, axis=1), axis=1)
+            nearest = np.take_along_axis(nearest, order, axis=1)
+            angles = np.arccos(np.take_along_axis(cos, nearest, axis=1))
+            distances[start:start + len(chunk)] = angles * EARTH_RADIUS_KM
+            indices[start:start + len(chunk)] = nearest
+        return distances, indices
+
+    def _estimate_arrays(self, points):
+        """
+        (estimates (points, fields) with NaN where unknown, usable (points, k), distances).
+        """
+        distances, indices = self.neighbours(points)
+        usable = distances <= self.max_km                                # (m, k)
+
+        exact = distances < 1e-6
+        with np.errstate(divide="ignore"):
+            weights = np.where(usable, 1.0 / distances ** self.power, 0.0)
+        # Points sitting on a station: only that station counts
+        on_station = exact.any(axis=1)
+        weights[on_station] = np.where(exact[on_station], 1.0, 0.0)
+
+        values = self.values[indices]                                    # (m, k, fields)
+        w = np.where(np.isnan(values), 0.0, weights[:, :, None])
+        total = w.sum(axis=1)                                            # (m, fields)
+        with np.errstate(invalid="ignore"):
+            estimates = np.nansum(values * w, axis=1) / total
+        estimates[~usable[:, 0]] = np.nan
+        return estimates, usable, distances
+
+    def estimate(self, points):
+        """
+        One result per (lat, lon) point: None if no station is within `max_km`,
+        else {field: value, ..., "neighbours": n, "nearest_km": d}.
+        """
+        points = list(points)
+        if not points or not self.k:
+            return [None] * len(points)
+        estimates, usable, distances = self._estimate_arrays(points)
+
+        results = []
+        for row in range(len(points)):
+            if not usable[row, 0]:
+                results.append(None)
+                continue
+            result = {
+                field: None if np.isnan(estimates[row, f]) else round(float(estimates[row, f]), 2)
+                for f, field in enumerate(FIELDS)
+            }
+            result["neighbours"] = int(usable[row].sum())
+            result["nearest_km"] = round(float(distances[row, 0]), 2)
+            results.append(result)
+        return results
+
+    def surface(self, points, field: str = "groundwater_level"):
+        """
+        Float array with the estimate of `field` at each (lat, lon) point, NaN where
+        there is none. Used to rasterize the interpolated surface.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if not len(points) or not self.k:
+            return np.full(len(points), np.nan)
+        estimates, _, _ = self._estimate_arrays(points)
+        return estimates[:, FIELDS.index(field)]
@@ -1,31 +1,153 @@
 import os
 import sqlite3
 import re
+import queue
+import threading
+import time
+import json
+import asyncio
+import math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
 import googlemaps
 from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 import google.generativeai as genai
 import csv
 from io import StringIO, BytesIO
 import openpyxl
 from openpyxl.styles import Font
+from schema import migrate, normalize_location
+from matcher import FuzzyMatcher, LocationMatcher, generate_aliases
+from spatial import EARTH_RADIUS_KM, StationIndex, geohash, haversine_km
+from cache import MISSING, PersistentTTLCache, TTLCache
+from resilience import CircuitBreaker, CircuitOpenError, SingleFlight
+from interpolation import IDWInterpolator
+from intents import classify, tokenize
+from intent_model import IntentModel
+from semantic_cache import SemanticCache
+from raster import EMPTY_TILE, HeatmapRaster, encode_png, render_tile
 
-DB_PATH = "groundwater.db"
+DB_PATH = os.getenv("DB_PATH", "groundwater.db")
+
+# Caches live in their own database so that cache writes never invalidate the
+# groundwater snapshot (which watches DB_PATH for commits)
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache.db")
+
+# Connection pool settings (see ConnectionPool below)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "128"))
+
+# PRAGMA profile applied to every pooled connection when it is opened
+DB_PRAGMAS = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("DB_CACHE_SIZE", "-16000")),  # negative = KiB
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+# Rows fetched per chunk when streaming /api/history
+HISTORY_CHUNK_SIZE = int(os.getenv("HISTORY_CHUNK_SIZE", "500"))
+
+# Typo-tolerant location matching, used when no alias matches exactly
+FUZZY_MATCH_MIN_SCORE = float(os.getenv("FUZZY_MATCH_MIN_SCORE", "0.8"))
+FUZZY_MATCH_BUDGET_MS = float(os.getenv("FUZZY_MATCH_BUDGET_MS", "1.0"))
+
+# Coordinates farther than this from every station fall back to Google Maps
+NEAREST_STATION_MAX_KM = float(os.getenv("NEAREST_STATION_MAX_KM", "25"))
+# If Maps cannot place them either (no match, error, timeout, breaker open),
+# the nearest station within this larger radius is used instead
+NEAREST_STATION_FALLBACK_KM = float(os.getenv("NEAREST_STATION_FALLBACK_KM", "75"))
+
+# Reverse-geocode cache: coordinates are quantized to a geohash cell of this precision.
+# Misses (no matching location) are cached too, for a shorter time.
+GEOCODE_CACHE_PRECISION = int(os.getenv("GEOCODE_CACHE_PRECISION", "6"))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", str(24 * 3600)))
+
+# Inverse-distance-weighted estimates between stations: neighbours used, distance
+# power, and the radius beyond which no estimate is given
+IDW_NEIGHBOURS = int(os.getenv("IDW_NEIGHBOURS", "6"))
+IDW_POWER = float(os.getenv("IDW_POWER", "2"))
+IDW_MAX_KM = float(os.getenv("IDW_MAX_KM", "100"))
+ESTIMATE_MAX_POINTS = int(os.getenv("ESTIMATE_MAX_POINTS", "10000"))
+
+# Heatmap tiles are cut from the raster init.py builds into RASTER_DIR; rendered
+# PNGs are kept in an LRU cache keyed on the raster version
+RASTER_DIR = os.getenv("RASTER_DIR", "raster")
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "2048"))
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "14"))
+
+# Local intent model (see intent_model.py) for data questions the keyword rules miss;
+# predictions below the confidence threshold are left to the rules / LLM
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "intent_model.json")
+INTENT_MODEL_MIN_CONFIDENCE = float(os.getenv("INTENT_MODEL_MIN_CONFIDENCE", "0.5"))
+
+# How often (seconds) readers may trigger a check for a newer groundwater snapshot
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "2.0"))
+
+# Gemini model for general questions, and the cache of its answers. Entries are keyed
+# by (model, language, normalized message) and kept in CACHE_DB_PATH across restarts.
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash-latest")
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "5000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Paraphrases of answered questions reuse the answer when their similarity (0-1)
+# reaches the threshold and they don't differ by opposite words (increase/decrease).
+# Calibrated on semantic_pairs.csv (python semantic_cache.py); above 1 turns this off
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+
+# Gemini limits: per-request deadline (seconds, including up to half of it waiting for
+# a free slot; for streamed answers, up to the last piece), max calls in flight, and
+# the circuit breaker that stops calling Gemini while it keeps failing. Past the
+# deadline the user gets a canned reply.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "8.0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_BREAKER_THRESHOLD = float(os.getenv("LLM_BREAKER_THRESHOLD", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# Alternative Gemini API endpoint, spoken to over REST (e.g. fake_gemini.py in tests)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
 
 # Load API keys from environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+# Point the Maps client at another server (e.g. a local stub in tests)
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+# Reverse geocoding limits: per-call deadline (seconds, including up to half of it
+# waiting for a free slot), max calls in flight, and the circuit breaker that stops
+# calling Maps while it keeps failing
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "3.0"))
+GEOCODE_MAX_CONCURRENCY = int(os.getenv("GEOCODE_MAX_CONCURRENCY", "4"))
+GEOCODE_BREAKER_THRESHOLD = float(os.getenv("GEOCODE_BREAKER_THRESHOLD", "0.5"))
+GEOCODE_BREAKER_COOLDOWN = float(os.getenv("GEOCODE_BREAKER_COOLDOWN", "30"))
 
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY environment variable not set")
-if not GOOGLE_MAPS_API_KEY:
-    raise ValueError("GOOGLE_MAPS_API_KEY environment variable not set")
 
-# Initialize the Gemini and Google Maps clients
-genai.configure(api_key=GEMINI_API_KEY)
-gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+# Initialize the Gemini and Google Maps clients. Maps is optional: coordinates are
+# resolved to the nearest station locally and Maps is only a fallback.
+if GEMINI_API_ENDPOINT:
+    genai.configure(api_key=GEMINI_API_KEY, transport="rest",
+                    client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+else:
+    genai.configure(api_key=GEMINI_API_KEY)
+gmaps = googlemaps.Client(
+    key=GOOGLE_MAPS_API_KEY,
+    timeout=GEOCODE_TIMEOUT,
+    retry_timeout=GEOCODE_TIMEOUT,
+    base_url=GOOGLE_MAPS_BASE_URL,
+) if GOOGLE_MAPS_API_KEY else None
 
 app = FastAPI(title="Groundwater Info API with Gemini")
 
@@ -37,28 +159,453 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class ConnectionPool:
+    """
+    A bounded pool of long-lived SQLite connections.
+
+    Connections are opened lazily (up to `size`), configured once with the
+    PRAGMA profile and handed out LIFO so the warmest connection, with its
+    page cache and prepared-statement cache, is reused first. When every
+    connection is busy, callers wait up to `timeout` seconds for one to be
+    returned and then get sqlite3.OperationalError.
+    """
+
+    def __init__(self, path: str, size: int, pragmas: dict, cached_statements: int,
+                 timeout: float = 10.0):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self.connect()
+                self._all.append(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"no pooled connection free after {self.timeout}s (pool size {self.size})"
+            ) from None
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            # Never hand a connection with an open transaction to the next caller
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._idle = queue.LifoQueue()
+
+db_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, DB_PRAGMAS, DB_STATEMENT_CACHE, DB_POOL_TIMEOUT)
+
+@app.on_event("startup")
+def migrate_db():
+    # Bring older groundwater.db files up to date (e.g. add location_key)
+    with db_pool.connection() as conn:
+        migrate(conn)
+
+@app.on_event("shutdown")
+def close_db_pool():
+    db_pool.close()
+
 def query_db(query, params=()):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        rows = conn.execute(query, params).fetchall()
     return [dict(row) for row in rows]
 
-def get_record_by_location(location: str):
-    rows = query_db("SELECT * FROM groundwater WHERE lower(location)=lower(?)", (location,))
-    return rows[0] if rows else None
+class Snapshot:
+    """
+    An immutable, versioned copy of the latest reading per station, keyed by location_key,
+    together with the alias index, location matchers, station index and interpolator
+    built from the same rows.
+    """
+    __slots__ = (
+        "version", "records", "aliases", "matcher", "fuzzy", "station_records", "stations", "interpolator"
+    )
+
+    def __init__(self, version: int, rows):
+        self.version = version
+        self.records = MappingProxyType({
+            row["location_key"]: MappingProxyType(dict(row)) for row in rows
+        })
+        # Aliases are regenerated with every snapshot, so newly ingested locations are matched too
+        self.aliases = MappingProxyType(generate_aliases(
+            (rec["location"] for rec in self.records.values()), location_aliases
+        ))
+        self.matcher = LocationMatcher(self.aliases)
+        self.fuzzy = FuzzyMatcher(self.aliases, FUZZY_MATCH_MIN_SCORE, FUZZY_MATCH_BUDGET_MS / 1000)
+        # Only stations with known coordinates take part in spatial lookups
+        self.station_records = tuple(
+            rec for rec in self.records.values()
+            if rec["latitude"] is not None and rec["longitude"] is not None
+        )
+        self.stations = StationIndex((rec["latitude"], rec["longitude"]) for rec in self.station_records)
+        self.interpolator = IDWInterpolator(
+            self.stations, self.station_records, IDW_NEIGHBOURS, IDW_POWER, IDW_MAX_KM
+        )
+
+    def nearest_station(self, latitude: float, longitude: float, max_km: float):
+        """
+        (record, distance_km) of the closest station within `max_km`, or None.
+        """
+        hits = self.stations.nearest(latitude, longitude)
+        if hits and hits[0][0] <= max_km:
+            distance, idx = hits[0]
+            return self.station_records[idx], distance
+        return None
+
+class SnapshotStore:
+    """
+    Holds the current Snapshot and swaps in a new one when the database changes.
+
+    Readers only dereference `self._current`, so they never take a lock or touch
+    SQLite. At most once every `interval` seconds one reader also checks
+    `PRAGMA data_version` on a dedicated connection (it changes whenever another
+    connection commits) and reloads the table if it moved; concurrent readers
+    keep using the old snapshot meanwhile instead of waiting.
+    """
+
+    def __init__(self, pool: ConnectionPool, interval: float):
+        self._pool = pool
+        self._interval = interval
+        self._current = None
+        self._conn = None
+        self._next_check = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def get(self) -> Snapshot:
+        snapshot = self._current
+        if snapshot is None or time.monotonic() >= self._next_check:
+            self._refresh(blocking=snapshot is None)
+            snapshot = self._current
+        return snapshot
+
+    def peek(self):
+        """
+        Returns the current snapshot if it can be used without a refresh check, else None.
+        """
+        if time.monotonic() < self._next_check:
+            return self._current
+        return None
+
+    def _refresh(self, blocking: bool):
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return
+        try:
+            self._next_check = time.monotonic() + self._interval
+            if self._conn is None:
+                self._conn = self._pool.connect()
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._current is None or self._current.version != version:
+                rows = self._conn.execute("SELECT * FROM latest_readings").fetchall()
+                self._current = Snapshot(version, rows)
+        except sqlite3.Error as e:
+            print(f"Snapshot refresh error: {e}")
+            if self._current is None:
+                raise
+        finally:
+            self._refresh_lock.release()
+
+    def close(self):
+        with self._refresh_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+groundwater_snapshot = SnapshotStore(db_pool, SNAPSHOT_CHECK_INTERVAL)
+
+@app.on_event("shutdown")
+def close_snapshot_store():
+    groundwater_snapshot.close()
+
+# --- Async data access for the FastAPI handlers ---
+# SQLite calls are blocking, so anything that may touch the database runs in the
+# threadpool instead of on the event loop.
+
+async def get_snapshot_async() -> Snapshot:
+    # Fast path: a fresh snapshot is a pure in-memory lookup, no need to leave the loop
+    snapshot = groundwater_snapshot.peek()
+    if snapshot is None:
+        snapshot = await run_in_threadpool(groundwater_snapshot.get)
+    return snapshot
+
+async def get_record_by_location_async(location: str):
+    snapshot = await get_snapshot_async()
+    return snapshot.records.get(normalize_location(location))
 
 # Function to get a general response from the LLM
-def get_llm_response(prompt: str):
+def get_llm_response(prompt: str) -> str:
+    """
+    Gemini's answer to `prompt`. Blocking; errors are raised.
+    """
+    model = genai.GenerativeModel(LLM_MODEL)
+    response = model.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT})
+    return response.text
+
+def start_llm_stream(prompt: str):
+    model = genai.GenerativeModel(LLM_MODEL)
+    response = model.generate_content(prompt, stream=True, request_options={"timeout": LLM_TIMEOUT})
+    return iter(response)
+
+# Dedicated, bounded threads for the blocking Gemini client, like geocode_executor
+llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+llm_breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN)
+
+@app.on_event("shutdown")
+def close_llm_executor():
+    llm_executor.shutdown(wait=False, cancel_futures=True)
+
+async def get_llm_response_async(prompt: str):
+    """
+    get_llm_response with a deadline of LLM_TIMEOUT, at most LLM_MAX_CONCURRENCY
+    calls in flight, and a circuit breaker. Waiting for a free slot may take up to
+    half of the deadline and the call gets the rest, so it is never squeezed into a
+    timeout by our own queue; only the call's timeouts and errors count against the
+    breaker. Returns None instead of an answer when the call fails, times out or the
+    breaker is open.
+    """
+    if not llm_breaker.allow():
+        return None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_TIMEOUT
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        response = model.generate_content(prompt)
-        return response.text
+        await asyncio.wait_for(llm_semaphore.acquire(), LLM_TIMEOUT / 2)
+    except asyncio.TimeoutError:
+        # Every slot is taken by our own calls, which says nothing about Gemini
+        print(f"No free LLM slot within {LLM_TIMEOUT / 2}s")
+        llm_breaker.release_trial()
+        return None
+    except BaseException:
+        # Cancelled before calling Gemini
+        llm_breaker.release_trial()
+        raise
+
+    budget = deadline - loop.time()
+    try:
+        reply = await asyncio.wait_for(
+            loop.run_in_executor(llm_executor, get_llm_response, prompt), budget
+        )
+    except asyncio.TimeoutError:
+        print(f"LLM API timed out after {budget:.1f}s")
+        llm_breaker.record_failure()
+        return None
     except Exception as e:
-        print(f"LLM API error: {e}")
-        return "I am unable to provide a general response at this moment."
+        print(f"LLM API error: {e!r}")
+        llm_breaker.record_failure()
+        return None
+    except BaseException:
+        # Cancelled mid-call (e.g. the client went away): the outcome is unknown, so
+        # record none, but don't keep the half-open trial slot taken for good
+        llm_breaker.release_trial()
+        raise
+    finally:
+        llm_semaphore.release()
+    llm_breaker.record_success()
+    return reply
+
+llm_cache = PersistentTTLCache(CACHE_DB_PATH, "llm_cache", LLM_CACHE_SIZE, LLM_CACHE_TTL)
+
+@app.on_event("shutdown")
+def close_llm_cache():
+    llm_cache.close()
+
+semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, LLM_CACHE_TTL, SEMANTIC_CACHE_THRESHOLD)
+# Rebuild the similarity index from the answers kept on disk
+for key, reply, expires_at in llm_cache.items(SEMANTIC_CACHE_SIZE):
+    model, language, question = json.loads(key)
+    if model == LLM_MODEL:
+        semantic_cache.add(question, (model, language), reply, expires_at)
+
+def normalize_message(msg: str) -> str:
+    # Case, punctuation and spacing don't change the question
+    return " ".join(tokenize(msg))
+
+def llm_cache_key(question: str, language: str) -> str:
+    return json.dumps([LLM_MODEL, language, question], ensure_ascii=False)
+
+def llm_prompt(msg: str, language: str) -> str:
+    return f"The user is asking a question in English. The reply must be in {language} and conversational.\nUser query: {msg}"
+
+def cached_llm_answer(question: str, language: str):
+    """
+    The cached answer to `question` or a close paraphrase of it, else MISSING.
+    """
+    reply = llm_cache.get(llm_cache_key(question, language))
+    if reply is not MISSING:
+        return reply
+    similar = semantic_cache.get(question, (LLM_MODEL, language))
+    return similar[0] if similar else MISSING
+
+def remember_llm_answer(question: str, language: str, reply: str):
+    llm_cache.set(llm_cache_key(question, language), reply)
+    semantic_cache.add(question, (LLM_MODEL, language), reply)
+
+# Identical questions asked while one is already being answered wait for that answer
+llm_singleflight = SingleFlight()
+
+async def answer_with_llm(msg: str, language: str) -> str:
+    """
+    Answers a general question, from the cache when it (or a close paraphrase)
+    has been asked before. Failed calls are not cached.
+    """
+    question = normalize_message(msg)
+    reply = await run_in_threadpool(cached_llm_answer, question, language)
+    if reply is not MISSING:
+        return reply
+
+    key = llm_cache_key(question, language)
+    pending = llm_singleflight.join(key)
+    if pending is not None:
+        reply = await asyncio.shield(pending)
+    else:
+        reply = None
+        try:
+            reply = await get_llm_response_async(llm_prompt(msg, language))
+            if reply is not None:
+                await run_in_threadpool(remember_llm_answer, question, language, reply)
+        finally:
+            llm_singleflight.finish(key, reply)
+    if reply is None:
+        return translations[language]["llm_unavailable"]
+    return reply
+
+# Yielded last by stream_llm_answer when Gemini failed after part of the answer was sent
+INCOMPLETE = object()
+
+async def stream_llm_answer(msg: str, language: str):
+    """
+    Like answer_with_llm, but yields the answer in pieces as Gemini produces them.
+    The LLM_TIMEOUT deadline covers the whole request, from waiting for a slot (at
+    most half of it, as in get_llm_response_async) to the last piece. If Gemini fails or runs out of time midway, the last item is INCOMPLETE
+    instead of text. Only complete answers are cached. A request that joins an
+    identical one in flight gets the whole answer at once when it is done.
+    """
+    question = normalize_message(msg)
+    reply = await run_in_threadpool(cached_llm_answer, question, language)
+    if reply is not MISSING:
+        yield reply
+        return
+
+    key = llm_cache_key(question, language)
+    pending = llm_singleflight.join(key)
+    if pending is not None:
+        reply = await asyncio.shield(pending)
+        yield translations[language]["llm_unavailable"] if reply is None else reply
+        return
+    # Only the leader asks the breaker, so a follower never holds the half-open trial
+    if not llm_breaker.allow():
+        llm_singleflight.finish(key, None)
+        yield translations[language]["llm_unavailable"]
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_TIMEOUT
+    try:
+        await asyncio.wait_for(llm_semaphore.acquire(), LLM_TIMEOUT / 2)
+    except asyncio.TimeoutError:
+        # Every slot is taken by our own calls, which says nothing about Gemini
+        print(f"No free LLM slot within {LLM_TIMEOUT / 2}s")
+        llm_breaker.release_trial()
+        llm_singleflight.finish(key, None)
+        yield translations[language]["llm_unavailable"]
+        return
+    except BaseException:
+        # Cancelled before calling Gemini
+        llm_breaker.release_trial()
+        llm_singleflight.finish(key, None)
+        raise
+
+    budget = deadline - loop.time()
+    parts = []
+    answer = None
+    try:
+        chunks = await asyncio.wait_for(
+            loop.run_in_executor(llm_executor, start_llm_stream, llm_prompt(msg, language)),
+            deadline - loop.time(),
+        )
+        while True:
+            chunk = await asyncio.wait_for(
+                loop.run_in_executor(llm_executor, next, chunks, None), deadline - loop.time()
+            )
+            if chunk is None:
+                break
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+        answer = "".join(parts)
+        llm_breaker.record_success()
+    except asyncio.TimeoutError:
+        print(f"LLM API timed out after {budget:.1f}s")
+        llm_breaker.record_failure()
+    except Exception as e:
+        print(f"LLM API error: {e!r}")
+        llm_breaker.record_failure()
+    except BaseException:
+        # The client went away mid-answer (CancelledError or GeneratorExit): the
+        # outcome is unknown, so record none, but give back the half-open trial slot
+        llm_breaker.release_trial()
+        raise
+    finally:
+        llm_semaphore.release()
+        llm_singleflight.finish(key, answer)
+    if answer is not None:
+        await run_in_threadpool(remember_llm_answer, question, language, answer)
+    elif parts:
+        yield INCOMPLETE
+    else:
+        yield translations[language]["llm_unavailable"]
+
+try:
+    intent_model = IntentModel.load(INTENT_MODEL_PATH)
+except (OSError, ValueError) as e:
+    print(f"Intent model not loaded, unmatched queries go to the LLM: {e}")
+    intent_model = None
+
+def predict_data_intent(msg: str):
+    """
+    The generate_reply query type the local model is confident `msg` asks for, or None.
+    """
+    if intent_model is None:
+        return None
+    label, confidence = intent_model.predict(msg)
+    if label == "general" or confidence < INTENT_MODEL_MIN_CONFIDENCE:
+        return None
+    return label
+
+# How /api/query requests were answered: keyword rules, database or LLM
+query_routes = Counter()
 
 class QueryIn(BaseModel):
     message: str
@@ -69,7 +616,15 @@ class QueryByLocationIn(BaseModel):
     longitude: float
     language: str = "en"
 
-# A mapping of common names to the exact names in the database
+class PointIn(BaseModel):
+    latitude: float
+    longitude: float
+
+class EstimateIn(BaseModel):
+    points: list[PointIn]
+
+# Hand-written aliases for the exact names in the database. Every stored location also
+# gets generated aliases (see matcher.generate_aliases); these take precedence over them.
 location_aliases = {
     "salem": "Salem", "salem (extended)": "Salem (Extended)", "puducherry": "Puducherry",
     "kumbakonam": "Kumbakonam Town", "kumbakonam town": "Kumbakonam Town", "kanchipuram": "Kanchipuram",
@@ -99,7 +654,9 @@ translations = {
         "bod_def": "BOD stands for Biochemical Oxygen Demand. It measures the amount of oxygen consumed by microorganisms to decompose organic matter in water.",
         "cod_def": "COD stands for Chemical Oxygen Demand. It measures the amount of oxygen required to chemically break down pollutants in water.",
         "ph_def": "pH is a measure of how acidic or alkaline (basic) the water is. A pH of 7 is neutral, while lower values are acidic and higher values are alkaline.",
-        "def_error": "I can define TDS, BOD, COD, or pH for you. Please ask for a specific term."
+        "def_error": "I can define TDS, BOD, COD, or pH for you. Please ask for a specific term.",
+        "llm_unavailable": "I can't answer general questions right now. Please try again shortly, or ask about the groundwater level, quality or status of a location.",
+        "llm_incomplete": "(This answer was cut off. Please ask again for the full answer.)"
     },
     "ta": {
         "greeting": "வணக்கம்! நிலத்தடி நீர் மட்டம், தரம் (pH/TDS/COD/BOD) மற்றும் பாசன நிலை குறித்து நான் உங்களுக்குச் சொல்ல முடியும். உதாரணமாக, 'குப்பம் நிலத்தடி நீர் மட்டம்' என்று கேளுங்கள்.",
@@ -121,7 +678,9 @@ translations = {
         "bod_def": "BOD என்பது உயிரி இரசாயன ஆக்ஸிஜன் தேவையைக் குறிக்கிறது. இது நீரில் உள்ள கரிமப் பொருட்களை சிதைக்க நுண்ணுயிரிகளால் பயன்படுத்தப்படும் ஆக்ஸிஜன் அளவை அளவிடுகிறது.",
         "cod_def": "COD என்பது இரசாயன ஆக்ஸிஜன் தேவையைக் குறிக்கிறது. இது நீரில் உள்ள மாசுக்களை இரசாயன ரீதியாக உடைக்கத் தேவையான ஆக்ஸிஜன் அளவை அளவிடுகிறது.",
         "ph_def": "pH என்பது நீர் எவ்வளவு அமிலத்தன்மை கொண்டது அல்லது காரத்தன்மை கொண்டது என்பதற்கான அளவீடு ஆகும். pH 7 என்பது நடுநிலை, அதேசமயம் குறைந்த மதிப்புகள் அமிலத்தன்மை கொண்டவை மற்றும் அதிக மதிப்புகள் காரத்தன்மை கொண்டவை.",
-        "def_error": "நான் உங்களுக்கு TDS, BOD, COD அல்லது pH-ஐ வரையறுக்க முடியும். தயவுசெய்து ஒரு குறிப்பிட்ட பதத்தைக் கேளுங்கள்."
+        "def_error": "நான் உங்களுக்கு TDS, BOD, COD அல்லது pH-ஐ வரையறுக்க முடியும். தயவுசெய்து ஒரு குறிப்பிட்ட பதத்தைக் கேளுங்கள்.",
+        "llm_unavailable": "இப்போது பொதுவான கேள்விகளுக்குப் பதிலளிக்க முடியவில்லை. சிறிது நேரம் கழித்து மீண்டும் முயற்சிக்கவும், அல்லது ஒரு இடத்தின் நிலத்தடி நீர் மட்டம், தரம் அல்லது நிலை பற்றிக் கேளுங்கள்.",
+        "llm_incomplete": "(இந்தப் பதில் பாதியில் நின்றுவிட்டது. முழுப் பதிலுக்கு மீண்டும் கேளுங்கள்.)"
     },
     "te": {
         "greeting": "నమస్కారం! నేను మీకు భూగర్భ జలాల స్థాయి, నాణ్యత (pH/TDS/COD/BOD), మరియు సాగునీటి స్థితి గురించి చెప్పగలను. ఉదాహరణకు, 'కుప్పం భూగర్భ జలాల స్థాయి' అని అడగండి.",
@@ -143,7 +702,9 @@ translations = {
         "bod_def": "BOD అంటే జీవరసాయన ఆక్సిజన్ డిమాండ్. ఇది నీటిలో సేంద్రీయ పదార్థాన్ని కుళ్ళిపోయేలా సూక్ష్మజీవుల ద్వారా వినియోగించబడే ఆక్సిజన్ మొత్తాన్ని కొలుస్తుంది.",
         "cod_def": "COD అంటే రసాయన ఆక్సిజన్ డిమాండ్. ఇది నీటిలో కాలుష్య కారకాలను రసాయనికంగా విచ్ఛిన్నం చేయడానికి అవసరమైన ఆక్సిజన్ మొత్తాన్ని కొలుస్తుంది.",
         "ph_def": "pH అనేది నీరు ఎంత ఆమ్లంగా లేదా క్షారంగా (బేసిక్) ఉందో కొలిచే కొలత. pH 7 అనేది நடுநிலை, అదేసమయం குறைந்த மதிப்புகள் ఆమ్లంగా మరియు అధిక విలువలు క్షారంగా ఉంటాయి.",
-        "def_error": "నేను మీకు TDS, BOD, COD లేదా pH ను నిర్వచించగలను. தயவுசெய்து ఒక నిర్దిஷ்ட పదం కోసం అడగండి."
+        "def_error": "నేను మీకు TDS, BOD, COD లేదా pH ను నిర్వచించగలను. தயவுசெய்து ఒక నిర్దిஷ்ட పదం కోసం అడగండి.",
+        "llm_unavailable": "ప్రస్తుతం సాధారణ ప్రశ్నలకు సమాధానం ఇవ్వలేను. కొద్దిసేపటి తర్వాత మళ్లీ ప్రయత్నించండి, లేదా ఒక ప్రాంతంలోని భూగర్భ జల మట్టం, నాణ్యత లేదా స్థితి గురించి అడగండి.",
+        "llm_incomplete": "(ఈ సమాధానం మధ్యలో ఆగిపోయింది. పూర్తి సమాధానం కోసం మళ్లీ అడగండి.)"
     }
 }
 
@@ -171,100 +732,331 @@ def generate_reply(rec: dict, language: str, query_type: str = "full"):
         f"{translations[language]['full_report_date'].format(date=rec['last_updated'])}"
     )
 
-def find_location_from_coords(latitude: float, longitude: float):
+geocode_cache = PersistentTTLCache(CACHE_DB_PATH, "geocode_cache", GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL)
+
+@app.on_event("shutdown")
+def close_geocode_cache():
+    geocode_cache.close()
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """
+    Adds the wall time of the block, in milliseconds, to timings[stage].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(f"{stage};dur={ms:.3f}" for stage, ms in timings.items())
+
+def geocode_component_names(reverse_geocode_result):
+    """
+    Normalized long and short names of every address component, most specific
+    result first, without duplicates.
+    """
+    names = {}
+    for result in reverse_geocode_result:
+        for component in result.get('address_components', ()):
+            for field in ('long_name', 'short_name'):
+                name = component.get(field)
+                if name:
+                    names.setdefault(normalize_location(name), None)
+    return list(names)
+
+def match_geocode_result(reverse_geocode_result, snapshot: Snapshot = None):
+    """
+    Returns the database location named in the geocoding result, if any.
+
+    Each component name is first looked up as a whole in the alias index, then
+    scanned with the location matcher (e.g. "Salem Division"), so the cost does
+    not depend on the number of aliases.
+    """
+    snapshot = snapshot or groundwater_snapshot.get()
+    names = geocode_component_names(reverse_geocode_result)
+    for name in names:
+        db_location = snapshot.aliases.get(name)
+        if db_location:
+            return db_location
+    for name in names:
+        db_location = snapshot.matcher.find(name)
+        if db_location:
+            return db_location
+    return None
+
+# Dedicated, bounded threads for the blocking googlemaps client, so slow Maps calls
+# can neither block the event loop nor take over Starlette's shared threadpool
+geocode_executor = ThreadPoolExecutor(max_workers=GEOCODE_MAX_CONCURRENCY, thread_name_prefix="geocode")
+geocode_semaphore = asyncio.Semaphore(GEOCODE_MAX_CONCURRENCY)
+geocode_breaker = CircuitBreaker(GEOCODE_BREAKER_THRESHOLD, cooldown=GEOCODE_BREAKER_COOLDOWN)
+
+@app.on_event("shutdown")
+def close_geocode_executor():
+    geocode_executor.shutdown(wait=False, cancel_futures=True)
+
+async def reverse_geocode_async(latitude: float, longitude: float):
+    """
+    gmaps.reverse_geocode with a deadline of GEOCODE_TIMEOUT, at most
+    GEOCODE_MAX_CONCURRENCY calls in flight, and a circuit breaker. Waiting for a
+    free slot may take up to half of the deadline and the call gets the rest.
+    Raises CircuitOpenError without calling Maps while the breaker is open;
+    timeouts and errors are raised, and count as failures only when they come from
+    the Maps call itself.
+    """
+    if not geocode_breaker.allow():
+        raise CircuitOpenError("Geocoding circuit breaker is open")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GEOCODE_TIMEOUT
+    try:
+        await asyncio.wait_for(geocode_semaphore.acquire(), GEOCODE_TIMEOUT / 2)
+    except BaseException:
+        # Timed out (every slot is taken by our own calls, which says nothing about
+        # Maps) or cancelled: either way Maps was not called
+        geocode_breaker.release_trial()
+        raise
+
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(geocode_executor, gmaps.reverse_geocode, (latitude, longitude)),
+            deadline - loop.time(),
+        )
+    except Exception:
+        geocode_breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled mid-call: the outcome is unknown, but the half-open trial slot is free again
+        geocode_breaker.release_trial()
+        raise
+    finally:
+        geocode_semaphore.release()
+    geocode_breaker.record_success()
+    return result
+
+async def find_location_from_coords(latitude: float, longitude: float, snapshot: Snapshot,
+                                    timings: dict = None):
     """
     Performs reverse geocoding to find a location that matches our database aliases.
+    Only used when no monitoring station is close enough (see nearest_station).
+    Results, including misses, are cached per geohash cell; API errors are not.
+    Geocoding results are matched against the caller's `snapshot`. Time spent per
+    stage is added to `timings` if given.
     """
+    if gmaps is None:
+        return None
+    timings = {} if timings is None else timings
+    with timed(timings, "geocode_cache"):
+        cell = geohash(latitude, longitude, GEOCODE_CACHE_PRECISION)
+        cached = await run_in_threadpool(geocode_cache.get, cell)
+    if cached is not MISSING:
+        return cached
+
     try:
-        reverse_geocode_result = gmaps.reverse_geocode((latitude, longitude))
-        if not reverse_geocode_result:
-            return None
-
-        # Check for matching location aliases in the geocoding results
-        for component in reverse_geocode_result:
-            for alias, db_location in location_aliases.items():
-                # Check if the alias exists in the address components
-                if alias.lower() in str(component['address_components']).lower():
-                    print(f"Match found: {db_location}")
-                    return db_location
+        with timed(timings, "geocode_api"):
+            reverse_geocode_result = await reverse_geocode_async(latitude, longitude)
+    except CircuitOpenError:
+        return None
+    except asyncio.TimeoutError:
+        print(f"Geocoding API timed out after {GEOCODE_TIMEOUT}s")
         return None
     except Exception as e:
-        print(f"Geocoding API error: {e}")
+        print(f"Geocoding API error: {e!r}")
         return None
 
-@app.post("/api/query")
-async def handle_query(query_in: QueryIn):
-    msg = query_in.message.lower().strip()
-    language = query_in.language if query_in.language in translations else "en"
-    
+    with timed(timings, "geocode_match"):
+        location = match_geocode_result(reverse_geocode_result, snapshot) if reverse_geocode_result else None
+    if location:
+        print(f"Match found: {location}")
+    with timed(timings, "geocode_cache"):
+        await run_in_threadpool(
+            geocode_cache.set, cell, location, GEOCODE_CACHE_TTL if location else GEOCODE_NEGATIVE_TTL
+        )
+    return location
+
+async def answer_locally(msg: str, language: str):
+    """
+    The reply to `msg` when it can be answered without the LLM, else None.
+    """
     # --- Step 1: Check for keyword-based replies first ---
-    if any(k in msg for k in ["hi", "hello", "hey"]):
+    # One word-boundary pass over the message (see intents.py)
+    intent = classify(msg)
+    if intent.name == "greeting":
+        query_routes["keyword"] += 1
         return {"reply": translations[language]["greeting"]}
-    if any(k in msg for k in ["what is", "define", "meaning of", "what does"]):
-        if "tds" in msg: return {"reply": translations[language]["tds_def"]}
-        if "bod" in msg: return {"reply": translations[language]["bod_def"]}
-        if "cod" in msg: return {"reply": translations[language]["cod_def"]}
-        if "ph" in msg: return {"reply": translations[language]["ph_def"]}
+
+    # Single pass over the message for every alias and stored location name
+    snapshot = await get_snapshot_async()
+    location = snapshot.matcher.find(msg)
+    # "what is the ph of water in salem" asks for Salem's readings, not for a definition
+    if intent.name == "define" and not location:
+        query_routes["keyword"] += 1
+        if intent.term:
+            return {"reply": translations[language][f"{intent.term}_def"]}
         return {"reply": translations[language]["def_error"]}
 
     # --- Step 2: Query the local database for specific data ---
-    location = None
-    for alias, db_location in location_aliases.items():
-        if alias in msg:
-            location = db_location
-            break
+    confidence = 1.0
+    predicted = predict_data_intent(msg)
+    if not location and (intent.query_type != "full" or predicted):
+        # Misspelled place names are resolved locally instead of going to the LLM, but
+        # only in questions about the data: "is eroded soil bad for wells" is not about Erode
+        fuzzy = snapshot.fuzzy.find(msg)
+        if fuzzy:
+            location, confidence, _ = fuzzy
 
     if location:
-        rec = get_record_by_location(location)
+        query_routes["database"] += 1
+        rec = await get_record_by_location_async(location)
         if not rec:
             return {"reply": translations[language]["no_data"].format(location=location)}
-            
-        query_type = "full"
-        if any(k in msg for k in ["level", "water table"]):
-            query_type = "level"
-        elif any(k in msg for k in ["ph", "tds", "cod", "bod", "quality"]):
-            query_type = "quality"
-        elif any(k in msg for k in ["status", "irrigation", "drinking", "recommended"]):
-            query_type = "status"
-
-        return {"reply": generate_reply(rec, language, query_type), "location": rec['location']}
+
+        # No keyword named what to report, e.g. "how deep is the water in Salem"
+        query_type = intent.query_type
+        if query_type == "full":
+            query_type = predicted or query_type
+        reply = {"reply": generate_reply(rec, language, query_type), "location": rec['location']}
+        if confidence < 1.0:
+            reply["confidence"] = round(confidence, 2)
+        return reply
     
+    # A question about the data without a place: ask for one instead of calling the LLM.
+    # Only when a keyword says so; the model alone also fires on general questions
+    # ("tell me about the monsoon"), which belong to the LLM.
+    if intent.query_type != "full":
+        query_routes["keyword"] += 1
+        return {"reply": translations[language]["no_location"]}
+    return None
+
+@app.post("/api/query")
+async def handle_query(query_in: QueryIn):
+    msg = query_in.message.lower().strip()
+    language = query_in.language if query_in.language in translations else "en"
+
+    reply = await answer_locally(msg, language)
+    if reply is not None:
+        return reply
+
     # --- Step 3: If no data-specific query is detected, send to LLM ---
-    llm_prompt = f"The user is asking a question in English. The reply must be in {language} and conversational.\nUser query: {msg}"
-    llm_response = get_llm_response(llm_prompt)
-    
+    query_routes["llm"] += 1
+    llm_response = await answer_with_llm(msg, language)
+
     return {"reply": llm_response}
 
+# --- STREAMING VARIANT OF /api/query (Server-Sent Events) ---
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def llm_events(msg: str, language: str):
+    done = {}
+    async for text in stream_llm_answer(msg, language):
+        if text is INCOMPLETE:
+            done = {"incomplete": True, "note": translations[language]["llm_incomplete"]}
+        else:
+            yield sse_event("delta", {"text": text})
+    yield sse_event("done", done)
+
+@app.post("/api/query/stream")
+async def stream_query(query_in: QueryIn):
+    """
+    Same answers as /api/query as a stream of `delta` events ({"text": ...}) followed
+    by one `done` event carrying the rest of the reply (e.g. "location"). LLM answers
+    arrive piece by piece; local ones in a single delta. If the LLM fails after some
+    pieces were sent, `done` has "incomplete": true and a "note" to show the user.
+    """
+    msg = query_in.message.lower().strip()
+    language = query_in.language if query_in.language in translations else "en"
+
+    reply = await answer_locally(msg, language)
+    if reply is not None:
+        text = reply.pop("reply")
+        events = iter([sse_event("delta", {"text": text}), sse_event("done", reply)])
+    else:
+        query_routes["llm"] += 1
+        events = llm_events(msg, language)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- NEW ENDPOINT FOR LOCATION-BASED QUERIES ---
 @app.post("/api/query_by_location")
-async def handle_location_query(query_in: QueryByLocationIn):
+async def handle_location_query(query_in: QueryByLocationIn, response: Response):
     language = query_in.language if query_in.language in translations else "en"
+    # Per-stage timings are reported to the client in the Server-Timing header
+    timings = {}
     
-    # Find the location name from the provided latitude and longitude
-    location_name = find_location_from_coords(query_in.latitude, query_in.longitude)
+    # Resolve the coordinates to the nearest monitoring station locally
+    snapshot = await get_snapshot_async()
+    with timed(timings, "nearest_station"):
+        nearest = snapshot.nearest_station(query_in.latitude, query_in.longitude, NEAREST_STATION_MAX_KM)
+    # Interpolated values at the exact point, added to every reply as "estimated"
+    with timed(timings, "estimate"):
+        estimated = snapshot.interpolator.estimate([(query_in.latitude, query_in.longitude)])[0]
+    extra = {"estimated": estimated} if estimated else {}
+    response.headers["Server-Timing"] = server_timing(timings)
+    if nearest:
+        rec, distance = nearest
+        reply = generate_reply(rec, language, "full")
+        return {"reply": reply, "location": rec['location'], "distance_km": round(distance, 2), **extra}
+
+    # Otherwise fall back to reverse geocoding the coordinates with Google Maps
+    location_name = await find_location_from_coords(query_in.latitude, query_in.longitude, snapshot, timings)
+    response.headers["Server-Timing"] = server_timing(timings)
+
+    if not location_name:
+        # Maps could not place the user (or is unavailable): use a more distant station
+        nearest = snapshot.nearest_station(query_in.latitude, query_in.longitude, NEAREST_STATION_FALLBACK_KM)
+        if nearest:
+            rec, distance = nearest
+            reply = generate_reply(rec, language, "full")
+            return {"reply": reply, "location": rec['location'], "distance_km": round(distance, 2), **extra}
     
     if location_name:
         # Get the groundwater record for the detected location
-        rec = get_record_by_location(location_name)
+        rec = await get_record_by_location_async(location_name)
         
         if rec:
             # Generate the full report and return it
             reply = generate_reply(rec, language, "full")
-            return {"reply": reply, "location": rec['location']}
+            return {"reply": reply, "location": rec['location'], **extra}
         else:
             # If no data found for the location, return a specific message
-            return {"reply": translations[language]["no_data"].format(location=location_name)}
+            return {"reply": translations[language]["no_data"].format(location=location_name), **extra}
     
     # If no matching location could be found, return a generic message
-    return {"reply": translations[language]["unknown_request"]}
+    return {"reply": translations[language]["unknown_request"], **extra}
+
+# --- ENDPOINT FOR BATCHED SPATIAL ESTIMATES ---
+@app.post("/api/estimate")
+async def estimate_points(estimate_in: EstimateIn):
+    if len(estimate_in.points) > ESTIMATE_MAX_POINTS:
+        raise HTTPException(status_code=413, detail=f"At most {ESTIMATE_MAX_POINTS} points per request")
+    snapshot = await get_snapshot_async()
+    points = [(p.latitude, p.longitude) for p in estimate_in.points]
+    estimates = await run_in_threadpool(snapshot.interpolator.estimate, points)
+    return {"estimates": estimates}
 
 # --- NEW ENDPOINT TO GENERATE AND DOWNLOAD EXCEL REPORT ---
 @app.get("/api/report/{location}")
 async def get_report(location: str):
-    rec = get_record_by_location(location)
+    rec = await get_record_by_location_async(location)
     if not rec:
         raise HTTPException(status_code=404, detail="Location not found")
 
+    # Building the workbook is CPU-bound, keep it off the event loop as well
+    content = await run_in_threadpool(build_report_workbook, rec, location)
+
+    return Response(
+        content=content,
+        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers={
+            'Content-Disposition': f'attachment; filename=groundwater_report_{location}.xlsx'
+        }
+    )
+
+def build_report_workbook(rec, location: str) -> bytes:
     output = BytesIO()
     workbook = openpyxl.Workbook()
     sheet = workbook.active
@@ -295,12 +1087,194 @@ async def get_report(location: str):
 
     # Save the workbook to the in-memory buffer
     workbook.save(output)
-    output.seek(0)
+    return output.getvalue()
 
-    return Response(
-        content=output.read(),
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        headers={
-            'Content-Disposition': f'attachment; filename=groundwater_report_{location}.xlsx'
-        }
-    )
\ No newline at end of file
+# --- ENDPOINT FOR THE READING HISTORY OF A LOCATION ---
+HISTORY_COLUMNS = ("observed_at", "groundwater_level", "pH", "TDS", "COD", "BOD", "status")
+
+def parse_history_bound(name: str, value: str):
+    """
+    (datetime, date only?) of an ISO date or date-time query parameter; any time
+    zone is dropped, as observed_at is stored without one.
+    """
+    try:
+        return datetime.combine(date.fromisoformat(value), datetime.min.time()), True
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None), False
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be an ISO date or date-time")
+
+def history_bounds(date_from: Optional[str], date_to: Optional[str]):
+    """
+    (lower, upper, upper_inclusive) observed_at bounds for the history query, in the
+    canonical ISO form observed_at is stored in ("2025-09-15", "2025-09-15T10:00:00"),
+    whatever ISO spelling the client used. A date-only `to` covers that whole day,
+    so it becomes an exclusive bound at the start of the next day.
+    """
+    lower, lower_text = datetime.min, ""
+    if date_from is not None:
+        lower, date_only = parse_history_bound("from", date_from)
+        lower_text = lower.date().isoformat() if date_only else lower.isoformat()
+    if date_to is None:
+        return lower_text, None, True
+
+    upper, date_only = parse_history_bound("to", date_to)
+    if date_only:
+        upper, inclusive = upper + timedelta(days=1), False
+        upper_text = upper.date().isoformat()
+    else:
+        inclusive = True
+        upper_text = upper.isoformat()
+    if lower > upper or (lower == upper and not inclusive):
+        raise HTTPException(status_code=400, detail="'from' is after 'to'")
+    return lower_text, upper_text, inclusive
+
+def stream_history(rec, lower: str, upper: Optional[str], upper_inclusive: bool):
+    """
+    Yields a JSON document with the readings of one station, chunk by chunk.
+    Each chunk is its own keyset query on the readings primary key and borrows a
+    pooled connection only while it runs, so a slow client never holds one.
+    """
+    upper_clause = ""
+    if upper is not None:
+        upper_clause = f" AND observed_at {'<=' if upper_inclusive else '<'} ?"
+
+    yield f'{{"location": {json.dumps(rec["location"])}, "readings": ['
+    separator = ""
+    after, lower_op = lower, ">="
+    while True:
+        sql = (
+            f"SELECT {', '.join(HISTORY_COLUMNS)} FROM readings "
+            f"WHERE location_id = ? AND observed_at {lower_op} ?{upper_clause} "
+            "ORDER BY observed_at LIMIT ?"
+        )
+        params = (rec['id'], after) + ((upper,) if upper is not None else ()) + (HISTORY_CHUNK_SIZE,)
+        with db_pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            break
+        yield separator + ",".join(json.dumps(dict(row)) for row in rows)
+        separator = ","
+        if len(rows) < HISTORY_CHUNK_SIZE:
+            break
+        # observed_at is unique per station (primary key), so resume strictly after it
+        after, lower_op = rows[-1]["observed_at"], ">"
+    yield "]}"
+
+@app.get("/api/history/{location}")
+async def get_history(
+    location: str,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+):
+    rec = await get_record_by_location_async(location)
+    if not rec:
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    bounds = history_bounds(date_from, date_to)
+
+    # Starlette iterates a sync generator in the threadpool, so SQLite stays off the event loop
+    return StreamingResponse(stream_history(rec, *bounds), media_type="application/json")
+
+# --- ENDPOINTS FOR SPATIAL STATION SEARCH ---
+# Both use the station_rtree R*Tree index; latest readings are joined by station id.
+STATIONS_IN_BOX = """
+    SELECT * FROM latest_readings WHERE id IN (
+        SELECT id FROM station_rtree
+        WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?
+    )
+    ORDER BY location_key
+    LIMIT ?
+"""
+
+def stations_in_box(min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int = -1):
+    # SQLite treats a negative LIMIT as no limit
+    return query_db(STATIONS_IN_BOX, (min_lat, max_lat, min_lon, max_lon, limit))
+
+def stations_near(lat: float, lon: float, radius_km: float, limit: int):
+    """
+    Stations within `radius_km` of (lat, lon), closest first, with distance_km.
+    The R*Tree narrows the search to the bounding box of the circle, then exact
+    haversine distances filter and order the candidates.
+    """
+    dlat = radius_km / (EARTH_RADIUS_KM * math.pi / 180)
+    coslat = math.cos(math.radians(lat))
+    dlon = 180.0 if coslat < 1e-6 else min(180.0, dlat / coslat)
+    found = []
+    for rec in stations_in_box(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+        distance = haversine_km(lat, lon, rec['latitude'], rec['longitude'])
+        if distance <= radius_km:
+            rec['distance_km'] = round(distance, 3)
+            found.append(rec)
+    found.sort(key=lambda rec: rec['distance_km'])
+    return found[:limit]
+
+@app.get("/api/stations/near")
+async def get_stations_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    stations = await run_in_threadpool(stations_near, lat, lon, radius_km, limit)
+    return {"count": len(stations), "stations": stations}
+
+@app.get("/api/stations/bbox")
+async def get_stations_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="Empty bounding box")
+    stations = await run_in_threadpool(stations_in_box, min_lat, min_lon, max_lat, max_lon, limit)
+    return {"count": len(stations), "stations": stations}
+
+# --- ENDPOINT FOR GROUNDWATER LEVEL HEATMAP TILES ---
+heatmap_raster = HeatmapRaster(RASTER_DIR)
+# Entries never go stale on their own: a rebuilt raster has a new version, hence new keys
+tile_cache = TTLCache(TILE_CACHE_SIZE, ttl=math.inf)
+
+def heatmap_tile(z: int, x: int, y: int):
+    raster = heatmap_raster.get()
+    if raster is None:
+        return None
+    data, meta = raster
+    key = (meta["version"], z, x, y)
+    png = tile_cache.get(key)
+    if png is MISSING:
+        rgba = render_tile(data, meta, z, x, y)
+        png = EMPTY_TILE if rgba is None else encode_png(rgba)
+        tile_cache.set(key, png)
+    return png
+
+@app.get("/api/tiles/{z}/{x}/{y}.png")
+async def get_heatmap_tile(z: int, x: int, y: int):
+    if not 0 <= z <= TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="No such tile")
+    png = await run_in_threadpool(heatmap_tile, z, x, y)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Heatmap raster has not been built, run init.py")
+    return Response(content=png, media_type="image/png",
+                    headers={"Cache-Control": "public, max-age=3600"})
+
+# --- ENDPOINT FOR SERVICE STATISTICS ---
+@app.get("/api/stats")
+async def get_stats():
+    total_queries = sum(query_routes.values())
+    return {
+        "geocode_cache": geocode_cache.stats(),
+        "geocode_breaker": geocode_breaker.stats(),
+        "tile_cache": tile_cache.stats(),
+        "query_routes": dict(query_routes),
+        "llm_breaker": llm_breaker.stats(),
+        "llm_singleflight": llm_singleflight.stats(),
+        "llm_cache": llm_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "llm_calls_saved": llm_cache.hits + semantic_cache.hits,
+        "llm_share": round(query_routes["llm"] / total_queries, 3) if total_queries else 0.0,
+    }
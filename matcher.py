@@ -0,0 +1,383 @@
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict, deque
+from typing import Optional
+from schema import normalize_location
+
+# Other spellings people use for stored locations (normalized name -> alternates)
+ALTERNATE_SPELLINGS = {
+    "chennai": ["madras"],
+    "coimbatore": ["kovai"],
+    "tiruchirappalli": ["trichy", "tiruchi", "tiruchirapalli", "thiruchirappalli", "trichinopoly"],
+    "tanjore": ["thanjavur", "thanjai"],
+    "kumbakonam": ["kudanthai"],
+    "nagapattinam": ["nagai"],
+    "thoothukudi": ["tuticorin"],
+    "tirunelveli": ["nellai"],
+    "nilgiris": ["the nilgiris"],
+    "ooty": ["udhagamandalam", "ootacamund"],
+    "kanchipuram": ["kancheepuram", "conjeevaram"],
+    "thiruvallur": ["tiruvallur"],
+    "thiruvarur": ["tiruvarur"],
+    "tirupur": ["tiruppur"],
+    "tiruvannamalai": ["thiruvannamalai"],
+    "pudukkottai": ["pudukottai"],
+    "ramanathapuram": ["ramnad"],
+    "mayiladuthurai": ["mayavaram"],
+    "arakkonam": ["arakonam"],
+    "velankanni": ["vailankanni"],
+    "ulundurpettai": ["ulundurpet"],
+    "thiruthuraipoondi": ["thiruthuraipundi"],
+    "villupuram": ["viluppuram"],
+    "puducherry": ["pondicherry", "pondy", "puduvai"],
+    "oulgaret": ["ozhukarai"],
+    "villianur": ["villiyanur"],
+    "bahour": ["bahur"],
+    "vijayawada": ["bezawada"],
+    "visakhapatnam": ["vizag", "vishakhapatnam"],
+    "rajahmundry": ["rajamahendravaram", "rajamundry"],
+    "kadapa": ["cuddapah"],
+    "kakinada": ["cocanada"],
+    "machilipatnam": ["masulipatnam"],
+    "anantapur": ["anantapuramu"],
+    "srikalahasti": ["kalahasti"],
+}
+
+# Native-script names (normalized name -> Tamil / Telugu spellings). Messages written in
+# these scripts are matched with an open end, since case suffixes attach to the name
+# (e.g. சென்னையில், విజయవాడలో); see LocationMatcher.
+NATIVE_NAMES = {
+    "chennai": ["சென்னை", "చెన్నై"],
+    "coimbatore": ["கோயம்புத்தூர்", "கோவை", "కోయంబత్తూరు"],
+    "madurai": ["மதுரை", "మదురై"],
+    "tiruchirappalli": ["திருச்சிராப்பள்ளி", "திருச்சி"],
+    "salem": ["சேலம்", "సేలం"],
+    "tirunelveli": ["திருநெல்வேலி", "நெல்லை"],
+    "vellore": ["வேலூர்", "వేలూరు"],
+    "erode": ["ஈரோடு"],
+    "tanjore": ["தஞ்சாவூர்", "தஞ்சை"],
+    "pudukkottai": ["புதுக்கோட்டை"],
+    "tirupattur": ["திருப்பத்தூர்"],
+    "cuddalore": ["கடலூர்"],
+    "thoothukudi": ["தூத்துக்குடி"],
+    "nilgiris": ["நீலகிரி"],
+    "ramanathapuram": ["இராமநாதபுரம்", "ராமநாதபுரம்"],
+    "nagapattinam": ["நாகப்பட்டினம்", "நாகை"],
+    "mayiladuthurai": ["மயிலாடுதுறை"],
+    "kanchipuram": ["காஞ்சிபுரம்", "காஞ்சி", "కాంచీపురం"],
+    "thiruvallur": ["திருவள்ளூர்"],
+    "ranipet": ["இராணிப்பேட்டை", "ராணிப்பேட்டை"],
+    "tirupur": ["திருப்பூர்"],
+    "kumbakonam": ["கும்பகோணம்", "குடந்தை"],
+    "dindigul": ["திண்டுக்கல்"],
+    "karur": ["கரூர்"],
+    "vellakoil": ["வெள்ளகோவில்"],
+    "ooty": ["ஊட்டி", "உதகமண்டலம்"],
+    "karaikal": ["காரைக்கால்"],
+    "thiruvarur": ["திருவாரூர்"],
+    "perambalur": ["பெரம்பலூர்"],
+    "aruppukottai": ["அருப்புக்கோட்டை"],
+    "viluppuram": ["விழுப்புரம்"],
+    "kovilpatti": ["கோவில்பட்டி"],
+    "ambur": ["ஆம்பூர்"],
+    "sivakasi": ["சிவகாசி"],
+    "nagercoil": ["நாகர்கோவில்"],
+    "namakkal": ["நாமக்கல்"],
+    "arani": ["ஆரணி"],
+    "gudalur": ["கூடலூர்"],
+    "pollachi": ["பொள்ளாச்சி"],
+    "karaikudi": ["காரைக்குடி"],
+    "tenkasi": ["தென்காசி"],
+    "sankari": ["சங்ககிரி"],
+    "palani": ["பழனி"],
+    "theni": ["தேனி"],
+    "ponneri": ["பொன்னேரி"],
+    "nandivaram-guduvanchery": ["கூடுவாஞ்சேரி"],
+    "coonoor": ["குன்னூர்"],
+    "bhavani": ["பவானி"],
+    "polur": ["போளூர்"],
+    "tiruvannamalai": ["திருவண்ணாமலை"],
+    "ulundurpettai": ["உளுந்தூர்பேட்டை"],
+    "arakkonam": ["அரக்கோணம்"],
+    "alandur": ["ஆலந்தூர்"],
+    "pudupattinam": ["புதுப்பட்டினம்"],
+    "sholavandan": ["சோழவந்தான்"],
+    "thiruthuraipoondi": ["திருத்துறைப்பூண்டி"],
+    "valparai": ["வால்பாறை"],
+    "velankanni": ["வேளாங்கண்ணி"],
+    "puducherry": ["புதுச்சேரி", "புதுவை", "పుదుచ్చేరి"],
+    "oulgaret": ["உழவர்கரை"],
+    "villianur": ["வில்லியனூர்"],
+    "ariyankuppam": ["அரியாங்குப்பம்"],
+    "bahour": ["பாகூர்"],
+    "mahe": ["மாஹே"],
+    "yanam": ["ஏனாம்", "యానాం"],
+    "kuppam": ["குப்பம்", "కుప్పం"],
+    "vijayawada": ["విజయవాడ"],
+    "visakhapatnam": ["విశాఖపట్నం", "విశాఖ", "వైజాగ్"],
+    "nellore": ["నెల్లూరు"],
+    "guntur": ["గుంటూరు"],
+    "rajahmundry": ["రాజమండ్రి", "రాజమహేంద్రవరం"],
+    "kakinada": ["కాకినాడ"],
+    "eluru": ["ఏలూరు"],
+    "srikakulam": ["శ్రీకాకుళం"],
+    "vizianagaram": ["విజయనగరం"],
+    "tirupati": ["తిరుపతి", "திருப்பதி"],
+    "kurnool": ["కర్నూలు"],
+    "kadapa": ["కడప"],
+    "anantapur": ["అనంతపురం"],
+    "machilipatnam": ["మచిలీపట్నం"],
+    "chittoor": ["చిత్తూరు"],
+    "proddatur": ["ప్రొద్దుటూరు"],
+    "tadepalligudem": ["తాడేపల్లిగూడెం"],
+    "ongole": ["ఒంగోలు"],
+    "tenali": ["తెనాలి"],
+    "nandyal": ["నంద్యాల"],
+    "rayachoti": ["రాయచోటి"],
+    "srikalahasti": ["శ్రీకాళహస్తి"],
+    "puttur": ["పుత్తూరు"],
+    "gudivada": ["గుడివాడ"],
+    "tiruvuru": ["తిరువూరు"],
+    "pulivendula": ["పులివెందుల"],
+    "adoni": ["ఆదోని"],
+    "srisailam": ["శ్రీశైలం"],
+    "bhimavaram": ["భీమవరం"],
+    "madanapalle": ["మదనపల్లె"],
+}
+
+# Suffixes that are often left out when people name a place
+_OPTIONAL_SUFFIXES = re.compile(r"\s*(\(extended\)|\btown)$")
+
+def _strip_punctuation(name: str) -> str:
+    # Only punctuation and symbols go; combining marks of Indic scripts must stay
+    return " ".join("".join(
+        " " if unicodedata.category(ch)[0] in "PS" else ch for ch in name
+    ).split())
+
+def _native_variants(name: str):
+    yield name
+    # Tamil names ending in -ம் take -த்- before case suffixes: சேலம் -> சேலத்தில்
+    if name.endswith("ம்"):
+        yield name[:-2] + "த்"
+
+def generate_aliases(locations, manual_aliases: dict = None) -> dict:
+    """
+    Builds {normalized alias: db_location} for every stored location.
+
+    Variants are the normalized name, the name without punctuation, the name without
+    a trailing "Town"/"(Extended)", the parts of hyphenated names, the
+    ALTERNATE_SPELLINGS and the NATIVE_NAMES. Precedence is exact names, then `manual_aliases`, then
+    generated variants; a variant claimed by two different locations is dropped
+    as ambiguous.
+    """
+    exact = {normalize_location(loc): loc for loc in locations}
+
+    generated, ambiguous = {}, set()
+    def add(alias, location):
+        alias = normalize_location(alias)
+        if not alias or alias in exact:
+            return
+        if generated.get(alias, location) != location:
+            ambiguous.add(alias)
+        generated[alias] = location
+
+    for key, location in exact.items():
+        bare = _strip_punctuation(key)
+        add(bare, location)
+        base = _OPTIONAL_SUFFIXES.sub("", key)
+        add(base, location)
+        add(_strip_punctuation(base), location)
+        if "-" in key:
+            for part in key.split("-"):
+                add(part, location)
+        for alternate in ALTERNATE_SPELLINGS.get(key, ()):
+            add(alternate, location)
+        for native in NATIVE_NAMES.get(key, ()):
+            for variant in _native_variants(native):
+                add(variant, location)
+
+    aliases = {alias: loc for alias, loc in generated.items() if alias not in ambiguous}
+    for alias, location in (manual_aliases or {}).items():
+        if normalize_location(location) in exact:
+            aliases[normalize_location(alias)] = location
+    aliases.update(exact)
+    return aliases
+
+def _is_word_char(ch: str) -> bool:
+    # Vowel signs and viramas (category M) are part of the word in Indic scripts
+    return ch.isalnum() or unicodedata.category(ch)[0] == "M"
+
+class LocationMatcher:
+    """
+    Aho-Corasick automaton over location names and aliases.
+
+    Built once from {alias: db_location}; `find` scans a message a single time,
+    whatever the number of patterns, and returns the location of the longest
+    alias that starts and ends on a word boundary (earliest wins on ties).
+    Non-Latin aliases only need to start on a word boundary, so inflected
+    forms such as சென்னையில் ("in Chennai") still match.
+    """
+
+    def __init__(self, patterns: dict):
+        # Trie as parallel lists: goto[node] is {char: node}
+        self._goto = [{}]
+        self._fail = [0]
+        self._value = [None]   # (length, db_location, open_end) if a pattern ends at this node
+        self._output = [0]     # nearest node on the fail chain that ends a pattern
+        for alias, location in patterns.items():
+            self._add(normalize_location(alias), location)
+        self._build()
+
+    def __len__(self):
+        return sum(1 for v in self._value if v is not None)
+
+    def _add(self, alias: str, location: str):
+        if not alias:
+            return
+        node = 0
+        for ch in alias:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._value.append(None)
+                self._output.append(0)
+            node = nxt
+        self._value[node] = (len(alias), location, not alias.isascii())
+
+    def _build(self):
+        # Breadth-first, so a node's fail target is always finished before the node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                fc = self._fail[child]
+                self._output[child] = fc if self._value[fc] is not None else self._output[fc]
+                queue.append(child)
+
+    def find(self, text: str) -> Optional[str]:
+        text = normalize_location(text)
+        goto, fail, value, output = self._goto, self._fail, self._value, self._output
+        best = None  # (length, -start, location)
+        node = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            mid_word = i + 1 < n and _is_word_char(text[i + 1]) and _is_word_char(ch)
+            hit = node if value[node] is not None else output[node]
+            while hit:
+                length, location, open_end = value[hit]
+                start = i + 1 - length
+                if mid_word and not open_end:
+                    pass
+                elif start == 0 or not _is_word_char(text[start - 1]) or not _is_word_char(text[start]):
+                    if best is None or (length, -start) > best[:2]:
+                        best = (length, -start, location)
+                hit = output[hit]
+        return best[2] if best else None
+
+def levenshtein(a: str, b: str, max_dist: int) -> Optional[int]:
+    """
+    Edit distance between `a` and `b`, or None as soon as it must exceed `max_dist`.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > max_dist:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_dist else None
+
+def _trigrams(s: str):
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FuzzyMatcher:
+    """
+    Typo-tolerant location lookup: a trigram index over the aliases picks a few
+    candidates per phrase of the message, which are then scored by edit distance.
+
+    `find` returns (db_location, score, phrase) for the best candidate scoring at least
+    `min_score` (1 - distance / length), or None. Short words are too easily one edit
+    away from a place name ("polar" / "Polur", "sales" / "Salem"), so below
+    MIN_EDIT_LENGTH characters only exact matches count. It gives up and returns the
+    best result so far once `budget` seconds have been spent.
+    """
+
+    MIN_PHRASE_LENGTH = 5
+    MIN_EDIT_LENGTH = 7
+    CANDIDATES_PER_PHRASE = 5
+
+    def __init__(self, aliases: dict, min_score: float = 0.8, budget: float = 0.001):
+        self.min_score = min_score
+        self.budget = budget
+        self._names = []
+        self._locations = []
+        self._gram_counts = []
+        self._postings = defaultdict(list)
+        self._max_words = 1
+        seen = set()
+        for alias, location in aliases.items():
+            name = _strip_punctuation(alias)
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            idx = len(self._names)
+            grams = _trigrams(name)
+            self._names.append(name)
+            self._locations.append(location)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(idx)
+            self._max_words = max(self._max_words, len(name.split()))
+        self._common_limit = max(1000, len(self._names) // 20)
+
+    def find(self, text: str):
+        deadline = time.perf_counter() + self.budget
+        words = _strip_punctuation(normalize_location(text)).split()
+        best = None
+        for n in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                phrase = " ".join(words[i:i + n])
+                if len(phrase) < self.MIN_PHRASE_LENGTH:
+                    continue
+                # Trigrams shared by a large share of the names barely discriminate and
+                # dominate the cost at scale, so only the rarer ones vote
+                postings = [self._postings.get(gram, ()) for gram in _trigrams(phrase)]
+                rare = [p for p in postings if len(p) <= self._common_limit] or postings
+                shared = Counter()
+                for posting in rare:
+                    shared.update(posting)
+                for idx, _ in shared.most_common(self.CANDIDATES_PER_PHRASE):
+                    name = self._names[idx]
+                    longest = max(len(name), len(phrase))
+                    max_distance = 0
+                    if min(len(name), len(phrase)) >= self.MIN_EDIT_LENGTH:
+                        max_distance = int(longest * (1 - self.min_score) + 1e-9)
+                    distance = levenshtein(phrase, name, max_distance)
+                    if distance is None:
+                        continue
+                    score = 1 - distance / longest
+                    if best is None or score > best[1]:
+                        best = (self._locations[idx], score, phrase)
+                if time.perf_counter() > deadline or (best and best[1] == 1.0):
+                    return best
+        return best
@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+from interpolation import FIELDS, IDWInterpolator
+from spatial import StationIndex
+
+# Area covered by the heatmap: Tamil Nadu and Puducherry, (min_lat, min_lon, max_lat, max_lon)
+TAMIL_NADU_BBOX = (8.0, 76.2, 13.6, 80.4)
+RASTER_FIELD = "groundwater_level"
+TILE_SIZE = 256
+
+# Colour ramp from shallow (blue) to deep (red) water levels, as (position, RGB)
+COLOUR_STOPS = (
+    (0.00, (44, 123, 182)),
+    (0.25, (171, 217, 233)),
+    (0.50, (255, 255, 191)),
+    (0.75, (253, 174, 97)),
+    (1.00, (215, 25, 28)),
+)
+TILE_ALPHA = 180
+
+def raster_paths(directory: str, field: str = RASTER_FIELD):
+    """
+    (array .npy path, metadata .json path) of the raster for `field`.
+    """
+    base = os.path.join(directory, field)
+    return base + ".npy", base + ".json"
+
+# --- Building the raster at ingest time ---
+
+def build_raster(conn, directory: str, bbox=TAMIL_NADU_BBOX, resolution: float = 0.01,
+                 field: str = RASTER_FIELD, k: int = 6, power: float = 2.0, max_km: float = 100.0):
+    """
+    Rasterizes the IDW surface of `field` over `bbox` into a float32 grid of
+    `resolution`-degree cells (row 0 is the northern edge, NaN = no estimate) and
+    writes it next to a JSON metadata file. Both files are replaced atomically, the
+    metadata last, so a running service never sees a half-written raster.
+    Returns the metadata.
+    """
+    started = time.perf_counter()
+    rows = conn.execute(
+        f"SELECT latitude, longitude, {', '.join(FIELDS)} FROM latest_readings "
+        "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    ).fetchall()
+    records = [dict(zip(("latitude", "longitude") + FIELDS, row)) for row in rows]
+    interpolator = IDWInterpolator(
+        StationIndex((rec["latitude"], rec["longitude"]) for rec in records), records, k, power, max_km
+    )
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    height = int(round((max_lat - min_lat) / resolution))
+    width = int(round((max_lon - min_lon) / resolution))
+    # Cell centres
+    lats = max_lat - (np.arange(height) + 0.5) * resolution
+    lons = min_lon + (np.arange(width) + 0.5) * resolution
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    points = np.column_stack([grid_lat.ravel(), grid_lon.ravel()])
+    grid = interpolator.surface(points, field).reshape(height, width).astype(np.float32)
+
+    known = grid[~np.isnan(grid)]
+    # Colour scale from the 2nd to the 98th percentile, so a few outliers don't flatten it
+    scale = [float(v) for v in np.percentile(known, [2, 98])] if known.size else [0.0, 1.0]
+    meta = {
+        "field": field,
+        "bbox": list(bbox),
+        "resolution": resolution,
+        "shape": [height, width],
+        "scale": scale,
+        "stations": len(records),
+        "version": time.time_ns(),
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    data_path, meta_path = raster_paths(directory, field)
+    with open(data_path + ".tmp", "wb") as f:
+        np.save(f, grid)
+    os.replace(data_path + ".tmp", data_path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    print(f"Raster {field} {height}x{width} from {len(records)} stations "
+          f"in {time.perf_counter() - started:.2f}s -> {data_path}")
+    return meta
+
+# --- Serving tiles from the raster ---
+
+class HeatmapRaster:
+    """
+    A raster built by build_raster, memory-mapped so only the cells a tile touches are
+    read from disk. The files are checked on every `get` (one stat call) and reopened
+    when a rebuild has replaced them.
+    """
+
+    def __init__(self, directory: str, field: str = RASTER_FIELD):
+        self.data_path, self.meta_path = raster_paths(directory, field)
+        self._current = None  # (meta file mtime, data, meta)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        (data, meta) of the current raster, or None if it has not been built.
+        """
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        current = self._current
+        if current is None or current[0] != mtime:
+            with self._lock:
+                if self._current is None or self._current[0] != mtime:
+                    with open(self.meta_path) as f:
+                        meta = json.load(f)
+                    data = np.load(self.data_path, mmap_mode="r")
+                    self._current = (mtime, data, meta)
+                current = self._current
+        return current[1], current[2]
+
+def tile_bounds(z: int, x: int, y: int):
+    """
+    (min_lat, min_lon, max_lat, max_lon) of a web mercator (slippy map) tile.
+    """
+    n = 2 ** z
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+    return lat(y + 1), x / n * 360 - 180, lat(y), (x + 1) / n * 360 - 180
+
+def _colour_table():
+    positions = [p for p, _ in COLOUR_STOPS]
+    steps = np.linspace(0, 1, 256)
+    table = np.empty((256, 4), dtype=np.uint8)
+    for channel in range(3):
+        table[:, channel] = np.interp(steps, positions, [rgb[channel] for _, rgb in COLOUR_STOPS])
+    table[:, 3] = TILE_ALPHA
+    return table
+
+COLOUR_TABLE = _colour_table()
+
+def render_tile(data, meta, z: int, x: int, y: int):
+    """
+    RGBA array (TILE_SIZE, TILE_SIZE, 4) of the tile, sampled nearest-cell from the
+    raster, or None if the tile does not overlap it.
+    """
+    min_lat, min_lon, max_lat, max_lon = meta["bbox"]
+    t_min_lat, t_min_lon, t_max_lat, t_max_lon = tile_bounds(z, x, y)
+    if t_min_lat >= max_lat or t_max_lat <= min_lat or t_min_lon >= max_lon or t_max_lon <= min_lon:
+        return None
+
+    # Pixel centres: longitude is linear across the tile, latitude follows the mercator y
+    n = 2 ** z
+    pixel = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + pixel) / n * 360 - 180
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixel) / n))))
+    resolution = meta["resolution"]
+    height, width = meta["shape"]
+    rows = np.floor((max_lat - lats) / resolution).astype(np.intp)
+    cols = np.floor((lons - min_lon) / resolution).astype(np.intp)
+    row_ok = (rows >= 0) & (rows < height)
+    col_ok = (cols >= 0) & (cols < width)
+
+    values = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    if row_ok.any() and col_ok.any():
+        values[np.ix_(row_ok, col_ok)] = data[np.ix_(rows[row_ok], cols[col_ok])]
+
+    lo, hi = meta["scale"]
+    known = ~np.isnan(values)
+    shade = np.zeros(values.shape, dtype=np.intp)
+    shade[known] = np.clip((values[known] - lo) / max(hi - lo, 1e-9) * 255, 0, 255).astype(np.intp)
+    rgba = COLOUR_TABLE[shade]
+    rgba[~known] = 0
+    return rgba
+
+def encode_png(rgba, level: int = 6) -> bytes:
+    """
+    Encodes an RGBA uint8 array (height, width, 4) as a PNG, without an imaging library.
+    """
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # leading 0 = no filter per row
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(tag: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), level))
+        + chunk(b"IEND", b"")
+    )
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
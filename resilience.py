@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import deque
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Fails fast when a dependency keeps erroring.
+
+    Outcomes of the last `window` calls are kept. Once at least `min_calls` are
+    recorded and the failure ratio reaches `failure_threshold`, the breaker opens
+    and `allow()` refuses calls for `cooldown` seconds. After that a single trial
+    call is let through (half-open): success closes the breaker, failure opens it
+    again for another cooldown.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: float = 0.5, window: int = 20,
+                 min_calls: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release_trial(self):
+        """
+        Gives back the half-open trial slot taken by allow() when the call it was
+        for never reached the dependency or was cancelled before its outcome was
+        known, so the next caller can make the trial.
+        """
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self._outcomes.clear()
+        self._outcomes.append(False)
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(True)
+        failures = sum(self._outcomes)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "recent_failures": sum(self._outcomes),
+            "recent_calls": len(self._outcomes),
+            "rejected": self.rejected,
+        }
+
+class SingleFlight:
+    """
+    Lets concurrent identical requests share one in-flight call (asyncio only).
+
+    The first caller of a key gets None from `join` and leads: it makes the call and
+    must always publish the outcome with `finish`, also on failure. Callers arriving
+    meanwhile get the leader's future from `join` and await it (through
+    asyncio.shield, so one of them giving up does not cancel it for the others).
+    """
+
+    def __init__(self):
+        self.calls = 0      # calls made by leaders
+        self.collapsed = 0  # calls avoided by joining one in flight
+        self._inflight = {}
+
+    def join(self, key):
+        future = self._inflight.get(key)
+        if future is None:
+            self._inflight[key] = asyncio.get_running_loop().create_future()
+            self.calls += 1
+            return None
+        self.collapsed += 1
+        return future
+
+    def finish(self, key, result):
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+        }
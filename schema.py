@@ -0,0 +1,198 @@
+import sqlite3
+
+# Base table, as created by the first version of init.py
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS groundwater (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location TEXT UNIQUE,
+    groundwater_level REAL,
+    pH REAL,
+    TDS INTEGER,
+    COD REAL,
+    BOD REAL,
+    status TEXT,
+    last_updated TEXT
+);
+"""
+
+def normalize_location(name: str) -> str:
+    """
+    Canonical lookup key for a location name: lowercased, whitespace collapsed.
+    This is what is stored in groundwater.location_key.
+    """
+    return " ".join(name.lower().split())
+
+def _columns(conn, table: str):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+# --- Migrations ---
+# Each migration brings the database from version N to N+1 (tracked in PRAGMA user_version).
+# They must work both on a fresh database and on an existing groundwater.db.
+
+def _add_location_key(conn):
+    if "location_key" not in _columns(conn, "groundwater"):
+        conn.execute("ALTER TABLE groundwater ADD COLUMN location_key TEXT")
+    conn.create_function("normalize_location", 1, normalize_location, deterministic=True)
+    conn.execute("UPDATE groundwater SET location_key = normalize_location(location)")
+    _merge_duplicate_locations(conn)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_groundwater_location_key ON groundwater(location_key)")
+
+def _merge_duplicate_locations(conn):
+    # The old UNIQUE(location) was case- and space-sensitive, so "Salem" and "salem "
+    # may both exist. Keep the most recently updated row per key (lowest id on a tie)
+    # and drop the others; at this version a row holds nothing but its latest reading.
+    duplicates = conn.execute("""
+        SELECT location_key, group_concat(location, ' | ') FROM groundwater
+        GROUP BY location_key HAVING COUNT(*) > 1
+    """).fetchall()
+    if not duplicates:
+        return
+    conn.execute("""
+        DELETE FROM groundwater WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY location_key
+                    ORDER BY COALESCE(last_updated, '') DESC, id
+                ) AS rank
+                FROM groundwater
+            ) WHERE rank = 1
+        )
+    """)
+    for key, names in duplicates:
+        print(f"Migration: merged locations that normalize to {key!r}: {names} (kept the latest reading)")
+
+def _add_readings(conn):
+    # groundwater becomes the station table; measurements live in readings, one row
+    # per (station, observation), so re-ingesting appends history instead of
+    # overwriting it. The measurement columns left on groundwater are legacy and
+    # are no longer maintained; read the latest values from latest_readings.
+    # The composite primary key is also the clustered index (WITHOUT ROWID), so
+    # per-station range scans read rows in order with no extra lookups.
+    # Readings without a date are stored with observed_at = '' (sorts before any date).
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS readings (
+            location_id INTEGER NOT NULL REFERENCES groundwater(id),
+            observed_at TEXT NOT NULL,
+            groundwater_level REAL,
+            pH REAL,
+            TDS INTEGER,
+            COD REAL,
+            BOD REAL,
+            status TEXT,
+            PRIMARY KEY (location_id, observed_at)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO readings
+            (location_id, observed_at, groundwater_level, pH, TDS, COD, BOD, status)
+        SELECT id, COALESCE(last_updated, ''), groundwater_level, pH, TDS, COD, BOD, status
+        FROM groundwater
+    """)
+    _create_latest_readings_view(conn, "g.id, g.location, g.location_key")
+
+def _create_latest_readings_view(conn, station_columns: str):
+    # Latest reading per station, with the same columns the old groundwater table had.
+    # CROSS JOIN pins groundwater as the outer loop, so each station costs one seek for
+    # MAX(observed_at) and one primary-key lookup in readings instead of a readings scan.
+    conn.execute("DROP VIEW IF EXISTS latest_readings")
+    conn.execute(f"""
+        CREATE VIEW latest_readings AS
+        SELECT
+            {station_columns},
+            r.groundwater_level, r.pH, r.TDS, r.COD, r.BOD, r.status,
+            r.observed_at AS last_updated
+        FROM groundwater g
+        CROSS JOIN readings r
+        WHERE r.location_id = g.id
+          AND r.observed_at = (SELECT MAX(observed_at) FROM readings WHERE location_id = g.id)
+    """)
+
+def _add_ingest_tracking(conn):
+    # Incremental ingest (init.py --incremental) compares incoming rows against the
+    # content hash of the latest reading ingested per station, and skips source files
+    # whose size and mtime match their recorded watermark.
+    columns = _columns(conn, "groundwater")
+    if "row_hash" not in columns:
+        conn.execute("ALTER TABLE groundwater ADD COLUMN row_hash TEXT")
+    if "hashed_at" not in columns:
+        conn.execute("ALTER TABLE groundwater ADD COLUMN hashed_at TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_watermarks (
+            source TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            max_observed_at TEXT,
+            rows_read INTEGER,
+            rows_written INTEGER,
+            ingested_at TEXT
+        )
+    """)
+
+def _add_station_coordinates(conn):
+    # Station coordinates let the service resolve a user's position to the nearest
+    # monitoring station locally (see spatial.StationIndex)
+    columns = _columns(conn, "groundwater")
+    if "latitude" not in columns:
+        conn.execute("ALTER TABLE groundwater ADD COLUMN latitude REAL")
+    if "longitude" not in columns:
+        conn.execute("ALTER TABLE groundwater ADD COLUMN longitude REAL")
+    _create_latest_readings_view(conn, "g.id, g.location, g.location_key, g.latitude, g.longitude")
+
+def _add_station_rtree(conn):
+    # R*Tree over station coordinates for radius / bounding-box searches. Stations
+    # are points, so each box is degenerate (min = max). Triggers keep it in sync
+    # with groundwater, so ingestion needs no changes.
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS station_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+    )
+    conn.execute("DELETE FROM station_rtree")
+    conn.execute("""
+        INSERT INTO station_rtree
+        SELECT id, latitude, latitude, longitude, longitude FROM groundwater
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS station_rtree_insert AFTER INSERT ON groundwater
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO station_rtree
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS station_rtree_update AFTER UPDATE OF latitude, longitude ON groundwater
+        BEGIN
+            DELETE FROM station_rtree WHERE id = old.id;
+            INSERT INTO station_rtree
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS station_rtree_delete AFTER DELETE ON groundwater
+        BEGIN
+            DELETE FROM station_rtree WHERE id = old.id;
+        END
+    """)
+
+MIGRATIONS = [
+    _add_location_key,
+    _add_readings,
+    _add_ingest_tracking,
+    _add_station_coordinates,
+    _add_station_rtree,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn: sqlite3.Connection):
+    """
+    Creates the schema if needed and applies any pending migrations. Safe to call repeatedly.
+    """
+    conn.executescript(BASE_SCHEMA)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for step in MIGRATIONS[version:]:
+        with conn:
+            step(conn)
+            version += 1
+            conn.execute(f"PRAGMA user_version={version}")
@@ -32,6 +32,30 @@ function addMessage(text, who='bot', isHtml=false){
     }
     messagesEl.appendChild(d);
     messagesEl.scrollTop = messagesEl.scrollHeight;
+    return d;
+}
+
+// Reads a Server-Sent Events response, calling onEvent(event, data) per event
+async function readEvents(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            let event = 'message', data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
 }
 
 const createDownloadButton = (location) => {
@@ -72,7 +96,8 @@ form.addEventListener('submit', async (e)=>{
     }
 
     try{
-        const res = await fetch(`${BACKEND_API}/query`, {
+        // Streamed, so LLM answers show up while they are being generated
+        const res = await fetch(`${BACKEND_API}/query/stream`, {
             method: 'POST',
             headers: {'Content-Type':'application/json'},
             body: JSON.stringify({
@@ -80,9 +105,32 @@ form.addEventListener('submit', async (e)=>{
                 language: selectedLanguage
             })
         });
-        const data = await res.json();
-        
-        addMessage(data.reply || JSON.stringify(data));
+        if (!res.ok || !res.body) {
+            addMessage('Error contacting backend: ' + res.status);
+            return;
+        }
+
+        const bubble = addMessage('');
+        let reply = '';
+        let data = {};
+        await readEvents(res, (event, payload) => {
+            if (event === 'delta') {
+                reply += payload.text;
+                bubble.innerHTML = reply.replace(/\n/g, '<br>');
+                messagesEl.scrollTop = messagesEl.scrollHeight;
+            } else if (event === 'done') {
+                data = payload;
+            }
+        });
+
+        // The answer stopped midway: say so instead of showing it as complete
+        if (data.incomplete) {
+            const note = document.createElement('em');
+            note.className = 'incomplete-note';
+            note.textContent = data.note;
+            bubble.appendChild(document.createElement('br'));
+            bubble.appendChild(note);
+        }
         
         if (data.location) {
             const downloadContainer = document.createElement('div');
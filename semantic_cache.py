@@ -0,0 +1,190 @@
+import threading
+import time
+import zlib
+import numpy as np
+from intents import tokenize
+
+# Words that frame a question rather than say what it is about
+STOPWORDS = {
+    "a", "an", "the", "to", "of", "in", "on", "for", "and", "or", "is", "are", "do", "does",
+    "i", "my", "me", "we", "you", "can", "how", "what", "s", "ways", "way", "please",
+    "tell", "about", "should", "it", "be", "with", "at", "from", "there", "any",
+    "explain", "tips", "reasons",
+}
+
+# Labelled question pairs the threshold is calibrated on: python semantic_cache.py
+PAIRS = "semantic_pairs.csv"
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+# Words that turn a question into its opposite while barely moving its embedding
+# ("how to increase groundwater" / "how to decrease groundwater")
+OPPOSITES = [
+    ("increase", "decrease"), ("increasing", "decreasing"), ("increased", "decreased"),
+    ("rise", "fall"), ("rising", "falling"), ("raise", "lower"), ("up", "down"),
+    ("more", "less"), ("more", "fewer"), ("high", "low"), ("higher", "lower"),
+    ("safe", "unsafe"), ("good", "bad"), ("better", "worse"), ("best", "worst"),
+    ("clean", "dirty"), ("pure", "impure"), ("improve", "worsen"),
+    ("add", "remove"), ("start", "stop"), ("fill", "drain"), ("deep", "shallow"),
+    ("hot", "cold"), ("summer", "winter"), ("wet", "dry"), ("before", "after"),
+    ("can", "cannot"), ("allowed", "banned"),
+]
+_OPPOSITE = {}
+for _a, _b in OPPOSITES:
+    _OPPOSITE.setdefault(_a, set()).add(_b)
+    _OPPOSITE.setdefault(_b, set()).add(_a)
+
+def content_words(text: str):
+    """
+    The words of `text` minus STOPWORDS, in order, with simple plurals folded
+    ("wells" -> "well").
+    """
+    tokens = tokenize(text)
+    return [_singular(t) for t in tokens if t not in STOPWORDS] or tokens
+
+def contradicts(words, other) -> bool:
+    """
+    True if a word only in `words` is the opposite of a word only in `other`.
+    """
+    words, other = set(words), set(other)
+    only_other = other - words
+    return any(_OPPOSITE.get(word, set()) & only_other for word in words - other)
+
+def embed(text: str, dim: int = 1024):
+    """
+    Unit vector of hashed content words and character trigrams of `text`. Trigrams
+    run across word boundaries, so "bore well" and "borewell" come out close.
+    """
+    return _embed_words(content_words(text), dim)
+
+def _embed_words(words, dim: int):
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in words:
+        vector[zlib.crc32(f"w:{word}".encode()) % dim] += 1.0
+    joined = "".join(words)
+    for i in range(len(joined) - 2):
+        vector[zlib.crc32(f"c:{joined[i:i + 3]}".encode()) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    """
+    Answers to earlier questions, looked up by similarity instead of exact text.
+
+    Questions are embedded with `embed` and kept in a fixed-size matrix; `get` scores
+    all of them against the query with one matrix-vector product and returns the
+    answer of the closest one in the same scope (e.g. model and language) whose
+    cosine similarity reaches `threshold`, unless the two differ by a pair of
+    OPPOSITES: similarity alone cannot tell "how to increase groundwater" from
+    "how to decrease groundwater". Such candidates are counted as `refused`. When
+    full, the oldest entry is replaced.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float = 0.85, dim: int = 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self.refused = 0
+        self._vectors = np.zeros((maxsize, dim), dtype=np.float32)
+        self._scopes = np.full(maxsize, -1, dtype=np.int32)
+        self._expires = np.zeros(maxsize)
+        self._values = [None] * maxsize
+        self._words = [None] * maxsize
+        self._scope_ids = {}
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def get(self, text: str, scope):
+        """
+        (answer, similarity) of the closest earlier question, or None.
+        """
+        words = content_words(text)
+        query = _embed_words(words, self.dim)
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            best = None
+            if scope_id is not None and self._size:
+                similarity = self._vectors[:self._size] @ query
+                usable = (self._scopes[:self._size] == scope_id) & (self._expires[:self._size] > time.time())
+                similarity[~usable] = -1.0
+                close = np.flatnonzero(similarity >= self.threshold)
+                for row in close[np.argsort(-similarity[close])]:
+                    if not contradicts(words, self._words[row]):
+                        best = (self._values[row], float(similarity[row]))
+                        break
+                if best is None and len(close):
+                    # Only contradicting candidates were close enough
+                    self.refused += 1
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def add(self, text: str, scope, value, expires_at: float = None):
+        words = content_words(text)
+        vector = _embed_words(words, self.dim)
+        with self._lock:
+            row = self._next
+            self._vectors[row] = vector
+            self._words[row] = words
+            self._scopes[row] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            self._expires[row] = time.time() + self.ttl if expires_at is None else expires_at
+            self._values[row] = value
+            self._next = (row + 1) % self.maxsize
+            self._size = max(self._size, row + 1)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refused": self.refused,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+# --- Calibration on labelled pairs: python semantic_cache.py [--threshold T] ---
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+
+    parser = argparse.ArgumentParser(description="Check the semantic cache threshold on labelled question pairs.")
+    parser.add_argument("--pairs", default=PAIRS, help="labelled CSV (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.85, help="similarity threshold (default: %(default)s)")
+    args = parser.parse_args()
+
+    with open(args.pairs, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    scores = {"same": [], "different": []}
+    matched = {"same": 0, "different": 0}
+    for row in rows:
+        cache = SemanticCache(maxsize=1, ttl=60, threshold=args.threshold)
+        cache.add(row["a"], None, row["a"])
+        similarity = float(embed(row["a"]) @ embed(row["b"]))
+        hit = cache.get(row["b"], None) is not None
+        # Pairs told apart by OPPOSITES don't constrain the threshold
+        if row["label"] == "same" or not contradicts(content_words(row["a"]), content_words(row["b"])):
+            scores[row["label"]].append(similarity)
+        matched[row["label"]] += hit
+        if hit != (row["label"] == "same"):
+            print(f"{'FALSE MATCH' if hit else 'miss'} {similarity:.3f}: {row['a']!r} / {row['b']!r}")
+
+    same, different = scores["same"], scores["different"]
+    print(f"threshold {args.threshold}: {matched['same']}/{len(same)} paraphrases reuse the answer, "
+          f"{matched['different']}/{sum(row['label'] == 'different' for row in rows)} different questions wrongly do")
+    print(f"similarity of paraphrases: min {min(same):.3f}; of different questions without "
+          f"opposite words: max {max(different):.3f}")
+    raise SystemExit(1 if matched["different"] else 0)
@@ -0,0 +1,110 @@
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def to_unit_vector(lat: float, lon: float):
+    """
+    Point on the unit sphere. Straight-line (chord) distance between two such points
+    grows monotonically with great-circle distance, so a plain 3-D KD-tree gives
+    exact haversine nearest neighbours.
+    """
+    p, l = math.radians(lat), math.radians(lon)
+    return (math.cos(p) * math.cos(l), math.cos(p) * math.sin(l), math.sin(p))
+
+def chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(lat: float, lon: float, precision: int = 6) -> str:
+    """
+    Standard base-32 geohash. Points in the same cell share the hash; each extra
+    character shrinks the cell (precision 6 is about 1.2 x 0.6 km, 7 about 150 m).
+    """
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch, lon_lo = (ch << 1) | 1, mid
+            else:
+                ch, lon_hi = ch << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch, lat_lo = (ch << 1) | 1, mid
+            else:
+                ch, lat_hi = ch << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+class StationIndex:
+    """
+    KD-tree over station coordinates for nearest-station lookups.
+
+    `points` is a sequence of (latitude, longitude); query results refer to
+    positions in that sequence.
+    """
+
+    def __init__(self, points):
+        self.points = tuple(points)
+        self._xyz = [to_unit_vector(lat, lon) for lat, lon in self.points]
+        # Flat tree: _nodes[i] = (point index, axis, left node, right node), -1 = no child
+        self._nodes = []
+        self._root = self._build(list(range(len(self._xyz))), 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, indices, depth):
+        if not indices:
+            return -1
+        axis = depth % 3
+        indices.sort(key=lambda i: self._xyz[i][axis])
+        mid = len(indices) // 2
+        node = len(self._nodes)
+        self._nodes.append(None)
+        left = self._build(indices[:mid], depth + 1)
+        right = self._build(indices[mid + 1:], depth + 1)
+        self._nodes[node] = (indices[mid], axis, left, right)
+        return node
+
+    def nearest(self, lat: float, lon: float, k: int = 1):
+        """
+        The `k` stations closest to (lat, lon) as [(distance_km, index)], closest first.
+        """
+        if self._root < 0 or k <= 0:
+            return []
+        target = to_unit_vector(lat, lon)
+        xyz, nodes = self._xyz, self._nodes
+        heap = []  # max-heap of (-squared chord, index), at most k entries
+        stack = [(self._root, 0.0)]  # (node, squared distance to its splitting plane)
+        while stack:
+            node, plane_d2 = stack.pop()
+            # Skip subtrees whose splitting plane is already farther than the k-th best
+            if node < 0 or (len(heap) == k and plane_d2 >= -heap[0][0]):
+                continue
+            idx, axis, left, right = nodes[node]
+            p = xyz[idx]
+            d2 = (p[0] - target[0]) ** 2 + (p[1] - target[1]) ** 2 + (p[2] - target[2]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, idx))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, idx))
+            diff = target[axis] - p[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, diff * diff))
+            stack.append((near, plane_d2))
+        return sorted((chord_to_km(math.sqrt(-d2)), idx) for d2, idx in heap)